@@ -1,167 +1,713 @@
 import pandas as pd
 import numpy as np
-import plotly.express as px
+import time
 import logging
-from sklearn.cluster import KMeans
+import itertools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from clustering import ClusteringEngine
+from correlation import CorrelationEngine, correlation_pairs
+from sharding import ShardingEngine
+from figures import encode_figure
+from serialization import to_native, series_to_dict, frame_to_dict
+from timeseries import TimeSeriesEngine
+from dedup import RowHashIndex, row_fingerprints
+from metrics import span, ANALYSIS_TIMEOUTS, ANALYSIS_OVERRUN_SECONDS
+from cancellation import AnalysisCancelled, check_cancelled, run_cancellable
+from downsampling import stratified_sample, uniform_sample, density_grid, downsample_series
+from stats_engine import StatsAccumulator, exact_quantiles
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Correlation plots: pairs in the wide-data bar chart, and matrix size up to which cells are labelled
+MAX_PLOTTED_PAIRS = 25
+MAX_LABELLED_CELLS_SIDE = 20
+
+# Analyses answered from a single StatsAccumulator scan
+SCAN_ANALYSIS_KEYS = ("descriptive_statistics", "correlation_matrix", "missing_values", "value_counts")
+
+# Column kinds each analysis reads; None means every column
+ANALYSIS_COLUMN_KINDS = {
+    "descriptive_statistics": None,
+    "missing_values": None,
+    "correlation_matrix": ("numeric",),
+    "value_counts": ("text",),
+    "time_series_analysis": ("datetime", "numeric"),
+    "clustering_analysis": ("numeric",),
+}
+
+# Private result key carrying the per-row cluster labels from analyze() to the visualization step
+CLUSTER_LABELS_KEY = "_cluster_labels"
+
 class DataProcessingAgent:
     """
     Agent responsible for cleaning and preprocessing the dataset.
+
+    Duplicate rows are found by hashing each row once into a 64-bit fingerprint (see
+    row_fingerprints), which is faster and lighter than comparing the rows themselves. With
+    `key_columns`, rows count as duplicates when those columns match; files without all of
+    them are deduplicated on every column. `spill_rows` and `spill_dir` let the fingerprint
+    set of a streamed upload spill to disk (see RowHashIndex).
     """
-    def process(self, df):
+    def __init__(self, key_columns=None, spill_rows=None, spill_dir=None):
+        self.key_columns = list(key_columns) if key_columns else None
+        self.spill_rows = spill_rows
+        self.spill_dir = spill_dir
+
+    def row_index(self, runs=()):
+        """
+        An empty RowHashIndex with this agent's spill settings, or one over existing `runs`.
+        """
+        return RowHashIndex(runs, spill_rows=self.spill_rows, spill_dir=self.spill_dir)
+
+    def fingerprints(self, df):
+        """
+        The fingerprint of every row of `df`, over the key columns when it has them all.
+        """
+        columns = self.key_columns
+        if columns is not None and not set(columns) <= set(df.columns):
+            logger.warning(f"Key columns {', '.join(map(str, columns))} not all present; deduplicating on every column.")
+            columns = None
+        return row_fingerprints(df, columns)
+
+    def process(self, df, row_index=None):
+        """
+        Remove duplicate rows. With a RowHashIndex, rows already in the index are removed too,
+        and the fingerprints of the kept rows are added to it.
+        """
         try:
             # Data Cleaning Steps
-            df = df.drop_duplicates()
-            logger.info(f"Duplicates removed. Data now has {df.shape[0]} rows and {df.shape[1]} columns.")
+            row_index = row_index if row_index is not None else self.row_index()
+            keep = row_index.add(self.fingerprints(df))
+            removed = len(df) - int(keep.sum())
+            if removed:
+                # take() returns a new frame rather than a filtered view, so preprocess can set its columns
+                df = df.take(np.flatnonzero(keep))
+            logger.info(f"Removed {removed} duplicate rows. Data now has {df.shape[0]} rows and {df.shape[1]} columns.")
             # Additional preprocessing can be added here
             return df
         except Exception as e:
             logger.error(f"Error in DataProcessingAgent.process: {e}")
             raise Exception(f"DataProcessingAgent.process failed: {e}")
 
+    def process_chunks(self, chunks, row_index=None):
+        """
+        Chunk-aware variant of process. Yields each chunk with duplicates removed,
+        including rows that duplicate a row from an earlier chunk, or a row already in
+        `row_index` when one is given. The fingerprints of the kept rows are added to
+        `row_index`.
+        """
+        try:
+            row_index = row_index if row_index is not None else self.row_index()
+            total_rows = 0
+            kept_rows = 0
+            for chunk in chunks:
+                keep = row_index.add(self.fingerprints(chunk))
+                total_rows += len(chunk)
+                kept_rows += int(keep.sum())
+                yield chunk if keep.all() else chunk.take(np.flatnonzero(keep))
+            logger.info(f"Removed {total_rows - kept_rows} duplicate rows. Data now has {kept_rows} of {total_rows} rows.")
+        except Exception as e:
+            logger.error(f"Error in DataProcessingAgent.process_chunks: {e}")
+            raise Exception(f"DataProcessingAgent.process_chunks failed: {e}")
+
 class PreprocessingAgent:
     """
     Agent responsible for further cleaning and preprocessing the dataset.
+
+    Column types are inferred from a strided sample of at most `inference_rows` rows and each
+    column is converted at most once, column by column, so the frame is never copied as a whole.
+    Integer columns are downcast to the smallest integer type that holds them, and float columns
+    to float32 when `downcast_floats` is set. Text columns whose sampled share of distinct values
+    is at most `category_threshold` are stored as `category`.
     """
-    def preprocess(self, df):
+    def __init__(self, inference_rows=1000, category_threshold=0.5, downcast_floats=False):
+        self.inference_rows = inference_rows
+        self.category_threshold = category_threshold
+        self.downcast_floats = downcast_floats
+
+    def infer_types(self, df, dtypes=None):
+        """
+        Target type of every column that needs converting: 'datetime', 'numeric', 'category' or 'text'.
+        Columns that are text in the locked `dtypes` (of an earlier chunk) stay 'text', even
+        when all their values here look like numbers or dates.
+        """
+        step = max(1, len(df) // self.inference_rows)
+        column_types = {}
+        for col in df.columns:
+            series = df[col]
+            if dtypes is not None and col in dtypes and _is_text_dtype(dtypes[col]):
+                column_types[col] = 'text'
+            elif 'date' in str(col).lower():
+                if not pd.api.types.is_datetime64_any_dtype(series):
+                    column_types[col] = 'datetime'
+            elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                column_types[col] = 'numeric'
+            elif series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype):
+                sample = series.iloc[::step].dropna()
+                if series.dtype == object and len(sample) > 0 and pd.to_numeric(sample, errors='coerce').notna().all():
+                    column_types[col] = 'numeric'
+                elif len(sample) > 0 and sample.nunique() <= self.category_threshold * len(sample):
+                    column_types[col] = 'category'
+                else:
+                    column_types[col] = 'text'
+        return column_types
+
+    def preprocess(self, df, categorize=True, dtypes=None):
+        """
+        Convert column types and fill missing values, modifying `df` column by column.
+        Set `categorize=False` to keep low-cardinality text columns as objects. Columns that are
+        text in the locked `dtypes` are kept (or made) text, see infer_types.
+        """
         try:
-            # Identify numeric and categorical columns
-            categorical_columns = df.select_dtypes(include=['object', 'category']).columns.tolist()
-            numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
-
-            # Handle missing values
-            df[categorical_columns] = df[categorical_columns].fillna('Unknown')
-            df[numeric_columns] = df[numeric_columns].fillna(df[numeric_columns].mean())
-
-            # Convert date columns to datetime
-            for col in df.columns:
-                if 'date' in col.lower():
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-
-            # Handle mixed data types
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    try:
-                        df[col] = pd.to_numeric(df[col])
-                    except ValueError:
-                        logger.warning(f"Column {col} contains non-numeric values. Skipping conversion.")
+            converted = []
+            for col, column_type in self.infer_types(df, dtypes).items():
+                series = original = df[col]
+                if column_type == 'text' and not _is_text_dtype(series.dtype):
+                    # Locked as text, but parsed as numbers in this chunk
+                    series = series.astype(str).where(series.notna())
+                if column_type == 'numeric' and series.dtype == object:
+                    numbers = pd.to_numeric(series, errors='coerce')
+                    if numbers.notna().sum() == series.notna().sum():
+                        series = numbers
+                        converted.append(col)
+                    else:
+                        column_type = 'text'
+
+                if column_type == 'datetime':
+                    # Gaps in date columns stay NaT
+                    series = pd.to_datetime(series, errors='coerce')
+                    converted.append(col)
+                elif column_type == 'numeric':
+                    if series.hasnans:
+                        series = series.fillna(series.mean())
+                    series = self._downcast(series)
+                else:
+                    if column_type == 'category' and categorize and series.dtype == object:
+                        # Factorizing first finds the gaps as code -1, so the object values are scanned once
+                        series = series.astype('category')
+                    if isinstance(series.dtype, pd.CategoricalDtype):
+                        if (series.cat.codes.to_numpy() == -1).any():
+                            if 'Unknown' not in series.cat.categories:
+                                series = series.cat.add_categories('Unknown')
+                            series = series.fillna('Unknown')
+                    else:
+                        missing = series.isna().to_numpy()
+                        if missing.any():
+                            series = series.where(~missing, 'Unknown')
 
+                if series is not original:
+                    df[col] = series
+
+            if converted:
+                logger.info(f"Converted column types: {', '.join(map(str, converted))}.")
             logger.info("Data preprocessing completed.")
             return df
         except Exception as e:
             logger.error(f"Error in PreprocessingAgent.preprocess: {e}")
             raise Exception(f"PreprocessingAgent.preprocess failed: {e}")
 
+    def _downcast(self, series):
+        if pd.api.types.is_integer_dtype(series):
+            return pd.to_numeric(series, downcast='integer')
+        if self.downcast_floats and pd.api.types.is_float_dtype(series):
+            return pd.to_numeric(series, downcast='float')
+        return series
+
+    def preprocess_chunks(self, chunks, dtypes=None):
+        """
+        Chunk-aware variant of preprocess. Column types are locked after the first chunk,
+        so a column converted to numeric or datetime in the first chunk is coerced the same
+        way in every later chunk. Numeric gaps are filled with the mean of their own chunk.
+        Text columns stay objects, since category codes would differ from chunk to chunk, and keep
+        their strings in later chunks whose values all look like numbers or dates.
+        Pass the `dtypes` of an existing dataset to lock every chunk to them instead, for
+        rows appended to that dataset.
+        """
+        try:
+            for chunk in chunks:
+                # preprocess replaces columns rather than writing into them, so a shallow copy suffices
+                chunk = self.preprocess(chunk.copy(deep=False), categorize=False, dtypes=dtypes)
+                if dtypes is None:
+                    dtypes = chunk.dtypes
+                else:
+                    for col, dtype in dtypes.items():
+                        if chunk[col].dtype == dtype:
+                            continue
+                        if pd.api.types.is_datetime64_any_dtype(dtype):
+                            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+                        elif pd.api.types.is_numeric_dtype(dtype):
+                            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+                        else:
+                            chunk[col] = chunk[col].astype(object)
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error in PreprocessingAgent.preprocess_chunks: {e}")
+            raise Exception(f"PreprocessingAgent.preprocess_chunks failed: {e}")
+
+
+def _is_text_dtype(dtype):
+    return dtype == object or isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype))
+
+
+class _ChunkAggregates:
+    """
+    Running aggregates folded over a stream of preprocessed chunks. Every statistic is
+    accumulated exactly except quantiles and clustering, which use a uniform sample. `rollup`
+    is the TimeSeriesRollup to update, or None when no time series is requested.
+    """
+    def __init__(self, sample_rows, stats, rollup, random_state=0):
+        self.sample_rows = sample_rows
+        self.rng = np.random.default_rng(random_state)
+        self.stats = stats
+        self.rollup = rollup
+        self.sample = None
+        self.sample_keys = np.empty(0)
+
+    @property
+    def n_rows(self):
+        return self.stats.n_rows
+
+    def update(self, chunk):
+        self.stats.update(chunk)
+        if self.rollup is not None:
+            self.rollup.update(chunk)
+        self._update_sample(chunk)
+
+    def _update_sample(self, chunk):
+        # Bottom-k sampling on uniform random keys keeps a uniform sample of all rows seen
+        keys = np.concatenate([self.sample_keys, self.rng.random(len(chunk))])
+        frame = chunk if self.sample is None else pd.concat([self.sample, chunk])
+        if len(frame) > self.sample_rows:
+            keep = np.argpartition(keys, self.sample_rows)[:self.sample_rows]
+            frame = frame.iloc[keep]
+            keys = keys[keep]
+        self.sample = frame
+        self.sample_keys = keys
+
 class AnalysisAgent:
     """
     Agent responsible for performing statistical analysis on the dataset.
+
+    Set `approximate=True` to compute quantiles, category counts and distinct counts with
+    streaming sketches (see StatsAccumulator for the error bounds of the sketch parameters).
+
+    Independent analyses run concurrently on up to `max_workers` threads (1 runs them inline).
+    `analysis_timeout` bounds each analysis in seconds, either one number for all of them or a
+    dict keyed by analysis name; an analysis that overruns is dropped from the results and
+    cancelled, stopping at its next cancellation check (see run_tasks).
+
+    `clustering` is the ClusteringEngine used by the clustering analysis and `time_series` the
+    TimeSeriesEngine used by the time series analysis. `correlation` is the CorrelationEngine
+    that replaces the correlation matrix with the strongest column pairs for wide data; streamed
+    wide data is correlated on the row sample. `sharding` is the ShardingEngine that, for large
+    frames, computes the aggregates of the scan and time series analyses on row shards in
+    worker processes (see sharded_analysis).
     """
+    def __init__(self, approximate=False, quantile_k=200, top_k=50, hll_precision=12,
+                 max_workers=3, analysis_timeout=None, clustering=None, time_series=None, correlation=None,
+                 sharding=None):
+        self.approximate = approximate
+        self.quantile_k = quantile_k
+        self.top_k = top_k
+        self.hll_precision = hll_precision
+        self.max_workers = max_workers
+        self.analysis_timeout = analysis_timeout
+        self.clustering = clustering if clustering is not None else ClusteringEngine()
+        self.time_series = time_series if time_series is not None else TimeSeriesEngine()
+        self.correlation = correlation if correlation is not None else CorrelationEngine()
+        self.sharding = sharding if sharding is not None else ShardingEngine()
+
+    def stats_accumulator(self, track_covariance=True, track_frequencies=True):
+        """
+        Create a StatsAccumulator configured with this agent's approximation settings.
+        """
+        return StatsAccumulator(
+            track_covariance=track_covariance,
+            track_frequencies=track_frequencies,
+            approximate=self.approximate,
+            quantile_k=self.quantile_k,
+            top_k=self.top_k,
+            hll_precision=self.hll_precision,
+        )
+
+    def quantiles(self, stats, df):
+        """
+        Quantiles for describe(): from the sketches in approximate mode, otherwise exact over `df`.
+        """
+        if self.approximate:
+            return stats.quantiles()
+        return exact_quantiles(df, stats.numeric_cols + stats.datetime_cols)
+
+    def required_columns(self, dtypes, analysis_params):
+        """
+        Columns the requested analyses read, given the dtypes of the dataset, in dataset order.
+        When no analysis reads numeric columns, the first two are included anyway for the
+        fallback scatter plot. Returns None when every column is needed.
+        """
+        kinds = set()
+        for key, column_kinds in ANALYSIS_COLUMN_KINDS.items():
+            if analysis_params.get(key, False):
+                if column_kinds is None:
+                    return None
+                kinds.update(column_kinds)
+        columns = []
+        plotted = 0
+        for col, dtype in dtypes.items():
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                kind = "datetime"
+            elif dtype == object or isinstance(dtype, pd.CategoricalDtype):
+                kind = "text"
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                kind = "numeric"
+            else:
+                kind = None
+            if kind in kinds:
+                columns.append(col)
+            elif kind == "numeric" and plotted < 2:
+                columns.append(col)
+                plotted += 1
+        return columns
+
     def analyze(self, df, analysis_params):
         try:
-            analysis_results = {}
+            tasks = {}
+            scan = any(analysis_params.get(key, False) for key in SCAN_ANALYSIS_KEYS)
+            time_series = analysis_params.get("time_series_analysis", False)
+
+            if (scan or time_series) and self.sharding.enabled_for(len(df)):
+                # Large frames are aggregated in one pass over row shards in worker processes
+                tasks["sharded"] = lambda: self.sharded_analysis(df, analysis_params)
+            else:
+                # Descriptive statistics, correlation, missing values and value counts share one scan
+                if scan:
+                    tasks["scan"] = lambda: self.scan_analysis(df, analysis_params)
 
-            # Descriptive Statistics
-            if analysis_params.get("descriptive_statistics", False):
-                descriptive_stats = df.describe(include='all').to_dict()
-                descriptive_stats = self.convert_to_native_types(descriptive_stats)
-                analysis_results["descriptive_statistics"] = descriptive_stats
-                logger.info("Descriptive statistics generated.")
-
-            # Correlation Matrix
-            if analysis_params.get("correlation_matrix", False):
-                numeric_df = df.select_dtypes(include='number')
-                correlation = numeric_df.corr().to_dict()
-                correlation = self.convert_to_native_types(correlation)
-                analysis_results["correlation_matrix"] = correlation
-                logger.info("Correlation matrix generated.")
-
-            # Missing Values Analysis
-            if analysis_params.get("missing_values", False):
-                missing_values = df.isnull().sum().to_dict()
-                missing_values = self.convert_to_native_types(missing_values)
-                analysis_results["missing_values"] = missing_values
-                logger.info("Missing values analysis completed.")
-
-            # Value Counts for Categorical Variables
-            if analysis_params.get("value_counts", False):
-                categorical_cols = df.select_dtypes(include=['object', 'category']).columns
-                value_counts = {col: df[col].value_counts().to_dict() for col in categorical_cols}
-                value_counts = self.convert_to_native_types(value_counts)
-                analysis_results["value_counts"] = value_counts
-                logger.info("Value counts for categorical variables generated.")
-
-            # Time Series Analysis
-            if analysis_params.get("time_series_analysis", False):
-                time_series_results = self.time_series_analysis(df)
-                analysis_results["time_series_analysis"] = time_series_results
-                logger.info("Time series analysis completed.")
+                # Time Series Analysis
+                if time_series:
+                    tasks["time_series_analysis"] = lambda: {"time_series_analysis": self.time_series_analysis(df)}
 
             # Clustering Analysis
             if analysis_params.get("clustering_analysis", False):
-                clustering_results = self.clustering_analysis(df)
-                analysis_results["clustering_analysis"] = clustering_results
-                logger.info("Clustering analysis completed.")
+                tasks["clustering_analysis"] = lambda: self.clustering_results(df)
 
+            analysis_results = {}
+            for results in self.run_tasks(tasks, shape=df.shape).values():
+                analysis_results.update(results)
             return analysis_results
         except Exception as e:
             logger.error(f"Error in AnalysisAgent.analyze: {e}")
             raise Exception(f"AnalysisAgent.analyze failed: {e}")
 
+    def run_tasks(self, tasks, shape=(None, None)):
+        """
+        Run independent analysis tasks (name -> callable returning a results dict) concurrently.
+        Each task is recorded as the metrics stage "analysis.<name>", labelled with the
+        (rows, columns) `shape` of the data.
+
+        Returns the results of the tasks that finished in time, in the order of `tasks`. Tasks
+        still queued when a timeout expires are cancelled. A running thread cannot be interrupted,
+        so a task that is already running is told to stop instead: the long loops of the engines
+        call check_cancelled() between blocks, columns and fits, and raise AnalysisCancelled at
+        the next check. The time it keeps running after its timeout (at most one step, such as
+        a single k-means fit) is recorded in analytiq_analysis_overrun_seconds. Errors raised by
+        a task propagate to the caller.
+        """
+        tasks = {name: self._timed(name, task, shape) for name, task in tasks.items()}
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            return {name: task() for name, task in tasks.items()}
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks)), thread_name_prefix='analysis')
+        try:
+            # Each task runs in a copy of the caller's context, so its span joins the request trace
+            cancel_events = {name: threading.Event() for name in tasks}
+            futures = {
+                name: executor.submit(contextvars.copy_context().run, run_cancellable, cancel_events[name], task)
+                for name, task in tasks.items()
+            }
+            started = time.monotonic()
+            completed = {}
+            for name, future in futures.items():
+                timeout = self._timeout_for(name)
+                remaining = None if timeout is None else max(0.0, started + timeout - time.monotonic())
+                try:
+                    completed[name] = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    cancel_events[name].set()
+                    if future.cancel():
+                        ANALYSIS_TIMEOUTS.inc(analysis=name, state='queued')
+                    else:
+                        ANALYSIS_TIMEOUTS.inc(analysis=name, state='running')
+                        future.add_done_callback(self._overrun_recorder(name, time.monotonic()))
+                    logger.warning(f"Analysis '{name}' exceeded its {timeout}s timeout and was dropped.")
+            return completed
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _overrun_recorder(name, timed_out):
+        def record(future):
+            overrun = time.monotonic() - timed_out
+            ANALYSIS_OVERRUN_SECONDS.observe(overrun, analysis=name)
+            stopped = "was cancelled" if isinstance(future.exception(), AnalysisCancelled) else "finished"
+            logger.warning(f"Timed-out analysis '{name}' {stopped} {overrun:.2f}s after its timeout.")
+        return record
+
+    @staticmethod
+    def _timed(name, task, shape):
+        def run():
+            with span(f"analysis.{name}", rows=shape[0], columns=shape[1]):
+                return task()
+        return run
+
+    def _timeout_for(self, name):
+        if isinstance(self.analysis_timeout, dict):
+            return self.analysis_timeout.get(name)
+        return self.analysis_timeout
+
+    def scan_analysis(self, df, analysis_params):
+        """
+        Run the scan-based analyses over `df` with a single StatsAccumulator pass.
+        """
+        stats = self.scan_accumulator(df, analysis_params).update(df)
+        check_cancelled()
+        return self.scan_results(stats, analysis_params, data=df)
+
+    def scan_accumulator(self, df, analysis_params):
+        """
+        An empty StatsAccumulator tracking what the requested scan analyses of `df` need.
+        """
+        # Wide data skips the dense co-moments; its correlations are computed block by block instead
+        wide = self.correlation.is_wide(len(df.select_dtypes(include='number').columns))
+        return self.stats_accumulator(
+            track_covariance=analysis_params.get("correlation_matrix", False) and not wide,
+            track_frequencies=analysis_params.get("descriptive_statistics", False)
+            or analysis_params.get("value_counts", False),
+        )
+
+    def sharded_analysis(self, df, analysis_params):
+        """
+        The scan and time series analyses of `df`, as from scan_analysis and
+        time_series_analysis, with their aggregates computed on row shards by the worker
+        processes of the ShardingEngine. Only the columns the requested analyses read are
+        shared with the workers; wide correlations are computed here.
+        """
+        scan = any(analysis_params.get(key, False) for key in SCAN_ANALYSIS_KEYS)
+        time_series = analysis_params.get("time_series_analysis", False)
+        columns = self.required_columns(df.dtypes, analysis_params)
+        shared = df if columns is None else df[columns]
+        # Exact quantiles are computed by the workers too, a share of the columns each
+        describe_exactly = analysis_params.get("descriptive_statistics", False) and not self.approximate
+        stats, rollup, quantiles = self.sharding.aggregate(
+            shared,
+            stats=self.scan_accumulator(shared, analysis_params) if scan else None,
+            rollup=self.time_series.rollup() if time_series else None,
+            quantile_columns=shared.select_dtypes(include=['number', 'datetime']).columns.tolist()
+            if describe_exactly else (),
+        )
+        analysis_results = {}
+        if scan:
+            analysis_results.update(self.scan_results(stats, analysis_params, quantiles, data=df))
+        if time_series:
+            with span("analysis.time_series_analysis", rows=len(df), columns=df.shape[1]):
+                analysis_results["time_series_analysis"] = self.time_series.summarize(rollup)
+        return analysis_results
+
+    def analyze_chunks(self, chunks, analysis_params, sample_rows=50000):
+        """
+        Chunk-aware variant of analyze. Folds each preprocessed chunk into running aggregates,
+        so memory is bounded by the chunk size plus a uniform sample of `sample_rows` rows.
+        Quantiles (unless approximate) and clustering are computed on the sample; every other
+        statistic is exact, or sketched in approximate mode.
+
+        Returns a tuple of the analysis results and the sample DataFrame.
+        """
+        try:
+            aggregates = self.aggregate_chunks(
+                chunks, sample_rows=sample_rows, time_series=analysis_params.get("time_series_analysis", False)
+            )
+            return self.aggregate_results(aggregates, analysis_params)
+        except Exception as e:
+            logger.error(f"Error in AnalysisAgent.analyze_chunks: {e}")
+            raise Exception(f"AnalysisAgent.analyze_chunks failed: {e}")
+
+    def aggregate_chunks(self, chunks, sample_rows=50000, time_series=True, aggregates=None):
+        """
+        Fold preprocessed chunks into running aggregates: a new set, or `aggregates` from an
+        earlier call to continue it, e.g. with rows appended to a dataset. The aggregates can be
+        pickled and turned into analysis results with aggregate_results.
+        """
+        if aggregates is None:
+            chunks = iter(chunks)
+            first_chunk = next(chunks, None)
+            if first_chunk is not None:
+                chunks = itertools.chain([first_chunk], chunks)
+            # Wide data is correlated on the sample, so the dense co-moments are not accumulated
+            wide = first_chunk is not None and self.correlation.is_wide(
+                len(first_chunk.select_dtypes(include='number').columns)
+            )
+            rollup = self.time_series.rollup() if time_series else None
+            aggregates = _ChunkAggregates(sample_rows, self.stats_accumulator(track_covariance=not wide), rollup)
+        rows_before = aggregates.n_rows
+        for chunk in chunks:
+            aggregates.update(chunk)
+        logger.info(f"Aggregated {aggregates.n_rows - rows_before} rows in chunks.")
+        return aggregates
+
+    def aggregate_results(self, aggregates, analysis_params):
+        """
+        The analysis results for running aggregates from aggregate_chunks.
+
+        Returns a tuple of the analysis results and the sample DataFrame.
+        """
+        if aggregates.sample is None:
+            raise ValueError("The dataset contains no rows.")
+        sample = aggregates.sample
+        shape = {"rows": aggregates.n_rows, "columns": sample.shape[1]}
+        analysis_results = {}
+        if any(analysis_params.get(key, False) for key in SCAN_ANALYSIS_KEYS):
+            with span("analysis.scan", **shape):
+                analysis_results = self.scan_results(aggregates.stats, analysis_params, data=sample)
+
+        if analysis_params.get("time_series_analysis", False):
+            with span("analysis.time_series_analysis", **shape):
+                analysis_results["time_series_analysis"] = self.time_series.summarize(aggregates.rollup)
+
+        if analysis_params.get("clustering_analysis", False):
+            with span("analysis.clustering_analysis", rows=len(sample), columns=sample.shape[1]):
+                analysis_results.update(self.clustering_results(sample))
+            logger.info(f"Clustering analysis ran on a sample of {len(sample)} rows.")
+
+        return analysis_results, sample
+
+    def scan_results(self, stats, analysis_params, quantiles=None, data=None):
+        """
+        Turn an accumulated StatsAccumulator into the results of the scan-based analyses.
+        `data` (the frame or the row sample) is correlated directly when it is wide, and gives
+        the quantiles of descriptive statistics unless `quantiles` are passed.
+
+        The scan is shared, but the work each analysis does on top of it is recorded as its own
+        metrics stage "analysis.<name>" (quantiles and describe, the correlations, ...).
+        """
+        analysis_results = {}
+        shape = {"rows": stats.n_rows, "columns": 0 if stats.columns is None else len(stats.columns)}
+
+        # Descriptive Statistics
+        if analysis_params.get("descriptive_statistics", False):
+            with span("analysis.descriptive_statistics", **shape):
+                if quantiles is None:
+                    quantiles = self.quantiles(stats, data)
+                analysis_results["descriptive_statistics"] = to_native(stats.describe(quantiles))
+            logger.info("Descriptive statistics generated.")
+
+        # Correlation Matrix
+        if analysis_params.get("correlation_matrix", False):
+            with span("analysis.correlation_matrix", **shape):
+                if self.correlation.is_wide(len(stats.numeric_cols)) and data is not None:
+                    analysis_results["correlation_matrix"] = self.correlation.analyze(data[stats.numeric_cols])
+                    logger.info("Strongest column correlations generated.")
+                else:
+                    analysis_results["correlation_matrix"] = frame_to_dict(stats.correlation())
+                    logger.info("Correlation matrix generated.")
+
+        # Missing Values Analysis
+        if analysis_params.get("missing_values", False):
+            with span("analysis.missing_values", **shape):
+                analysis_results["missing_values"] = series_to_dict(stats.missing_values())
+            logger.info("Missing values analysis completed.")
+
+        # Value Counts for Categorical Variables
+        if analysis_params.get("value_counts", False):
+            with span("analysis.value_counts", **shape):
+                analysis_results["value_counts"] = {
+                    col: series_to_dict(counts) for col, counts in stats.value_counts(stats.value_count_cols).items()
+                }
+            logger.info("Value counts for categorical variables generated.")
+
+        return analysis_results
+
     def time_series_analysis(self, df):
-        # Identify date columns
-        date_cols = df.select_dtypes(include=['datetime', 'datetime64']).columns
-        if len(date_cols) > 0:
-            date_col = date_cols[0]  # Use the first date column
-            df_sorted = df.sort_values(by=date_col)
-            df_sorted.set_index(date_col, inplace=True)
-            numeric_cols = df_sorted.select_dtypes(include='number').columns
-            if len(numeric_cols) > 0:
-                time_series_summary = df_sorted[numeric_cols].resample('M').mean().to_dict()
-                return self.convert_to_native_types(time_series_summary)
-            else:
-                logger.warning("No numeric columns for time series analysis.")
-                return {}
-        else:
-            logger.warning("No date columns found for time series analysis.")
-            return {}
+        return self.time_series.analyze(df)
+
+    def clustering_results(self, df):
+        """
+        Clustering counts plus the per-row labels under CLUSTER_LABELS_KEY, for the scatter plot.
+        """
+        labels = self.cluster_labels(df)
+        if labels is None:
+            return {"clustering_analysis": {}}
+        logger.info("Clustering analysis completed.")
+        return {
+            "clustering_analysis": series_to_dict(labels.value_counts()),
+            CLUSTER_LABELS_KEY: labels,
+        }
 
     def clustering_analysis(self, df):
-        numeric_df = df.select_dtypes(include='number').dropna()
-        if numeric_df.shape[0] > 0 and numeric_df.shape[1] >= 2:
-            kmeans = KMeans(n_clusters=3)
-            kmeans.fit(numeric_df)
-            clusters = kmeans.labels_
-            df['Cluster'] = clusters
-            cluster_counts = df['Cluster'].value_counts().to_dict()
-            return self.convert_to_native_types(cluster_counts)
+        labels = self.cluster_labels(df)
+        if labels is None:
+            return {}
+        return series_to_dict(labels.value_counts())
+
+    def cluster_labels(self, df):
+        """
+        Cluster label of every row of `df` (missing for rows with missing numeric values),
+        as a nullable integer Series in the row order of `df`. Returns None when there is not
+        enough numeric data. `df` is not modified.
+        """
+        numeric_df = df.select_dtypes(include='number')
+        complete = numeric_df.notna().all(axis=1).to_numpy()
+        if complete.any() and numeric_df.shape[1] >= 2:
+            labels = pd.Series(pd.NA, index=df.index, dtype='Int64', name='Cluster')
+            labels[complete] = self.clustering.fit_predict(numeric_df[complete])
+            return labels
         else:
             logger.warning("Insufficient numeric data available for clustering.")
-            return {}
+            return None
 
     def convert_to_native_types(self, data):
         """
         Recursively convert NumPy and pandas data types to native Python types.
         """
-        if isinstance(data, dict):
-            return {k: self.convert_to_native_types(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self.convert_to_native_types(v) for v in data]
-        elif isinstance(data, (np.integer, np.floating, np.bool_)):
-            return data.item()
-        elif pd.isnull(data):
-            return None
-        else:
-            return data
+        return to_native(data)
 
 class VisualizationAgent:
     """
     Agent responsible for creating visualizations based on analysis results.
+
+    Plots carry at most `point_budget` points: time series are reduced with LTTB, cluster scatter
+    plots are sampled per cluster, and the fallback scatter plot is sampled uniformly up to
+    `density_threshold` rows and becomes a `heatmap_bins` x `heatmap_bins` density heatmap above it.
+    With `binary_figures=True` numeric arrays are shipped as base64 typed arrays (see encode_figure).
     """
-    def visualize(self, df, analysis_results, styling_params):
+    def __init__(self, point_budget=5000, density_threshold=100_000, heatmap_bins=100, binary_figures=True):
+        self.point_budget = point_budget
+        self.density_threshold = density_threshold
+        self.heatmap_bins = heatmap_bins
+        self.binary_figures = binary_figures
+
+    def settings(self):
+        """
+        The parameters that change the figures, for cache keys.
+        """
+        return {
+            "point_budget": self.point_budget,
+            "density_threshold": self.density_threshold,
+            "heatmap_bins": self.heatmap_bins,
+            "binary_figures": self.binary_figures,
+        }
+
+    def visualize(self, df, analysis_results, styling_params, cluster_labels=None):
+        """
+        Build the figure for the results. `cluster_labels` (as returned by
+        AnalysisAgent.cluster_labels) colors the clustering scatter plot.
+        """
+        # Imported on first use: plotly.express is slow to import and only needed here
+        import plotly.express as px
+        import plotly.graph_objects as go
+
         try:
             fig = None
             commentary = ""
@@ -189,25 +735,45 @@ class VisualizationAgent:
 
             elif "correlation_matrix" in analysis_results:
                 correlation = analysis_results["correlation_matrix"]
-                df_corr = pd.DataFrame(correlation)
+                pairs = correlation_pairs(correlation)
+                if pairs is not None:
+                    shown = pairs[:MAX_PLOTTED_PAIRS]
+                    fig = px.bar(
+                        x=[pair["correlation"] for pair in shown],
+                        y=[f"{pair['column_a']} × {pair['column_b']}" for pair in shown],
+                        orientation='h',
+                        title='Strongest Correlations',
+                        labels={'x': 'Correlation Coefficient', 'y': 'Column Pair'},
+                        range_x=[-1, 1],
+                    )
+                    fig.update_layout(title_font_size=24, yaxis={'autorange': 'reversed'})
+                    commentary = (f"Generated a bar chart of the {len(shown)} most strongly correlated pairs "
+                                  f"among {correlation['columns']:,} numeric columns, computed on "
+                                  f"{correlation['rows']:,} rows.")
+                else:
+                    df_corr = pd.DataFrame(correlation)
 
-                fig = px.imshow(
-                    df_corr,
-                    text_auto=True,
-                    title='Correlation Matrix',
-                    labels=dict(x="Variables", y="Variables", color="Correlation Coefficient")
-                )
-                fig.update_layout(title_font_size=24)
+                    fig = px.imshow(
+                        df_corr,
+                        # Cell labels are only readable on small matrices
+                        text_auto='.2f' if len(df_corr) <= MAX_LABELLED_CELLS_SIDE else False,
+                        title='Correlation Matrix',
+                        labels=dict(x="Variables", y="Variables", color="Correlation Coefficient")
+                    )
+                    fig.update_layout(title_font_size=24)
 
-                commentary = "Generated a heatmap displaying the correlation matrix of the dataset."
+                    commentary = "Generated a heatmap displaying the correlation matrix of the dataset."
 
             elif "time_series_analysis" in analysis_results:
                 # For simplicity, let's plot the time series of the first numeric column
                 time_series_data = analysis_results["time_series_analysis"]
                 if time_series_data:
                     first_metric = next(iter(time_series_data))
-                    dates = list(time_series_data[first_metric].keys())
-                    values = list(time_series_data[first_metric].values())
+                    dates, values = downsample_series(
+                        list(time_series_data[first_metric].keys()),
+                        list(time_series_data[first_metric].values()),
+                        self.point_budget,
+                    )
                     fig = px.line(x=dates, y=values, title=f'Time Series of {first_metric}')
                     commentary = f"Generated a time series plot for {first_metric}."
                 else:
@@ -216,13 +782,20 @@ class VisualizationAgent:
 
             elif "clustering_analysis" in analysis_results:
                 # Scatter plot with clusters
-                if 'Cluster' in df.columns:
+                if cluster_labels is not None:
                     numeric_cols = df.select_dtypes(include='number').columns.tolist()
                     if len(numeric_cols) >= 2:
-                        fig = px.scatter(df, x=numeric_cols[0], y=numeric_cols[1], color='Cluster',
+                        labeled = cluster_labels.notna().to_numpy()
+                        clustered = df[numeric_cols[:2]][labeled].assign(
+                            Cluster=cluster_labels[labeled].astype('int64').to_numpy()
+                        )
+                        shown = stratified_sample(clustered, clustered['Cluster'].to_numpy(), self.point_budget)
+                        fig = px.scatter(shown, x=numeric_cols[0], y=numeric_cols[1], color='Cluster',
                                          title='Clustering Analysis',
                                          labels={'color': 'Cluster'})
                         commentary = f"Generated a scatter plot with clusters based on {numeric_cols[0]} and {numeric_cols[1]}."
+                        if len(shown) < len(clustered):
+                            commentary += f" It shows a sample of {len(shown):,} of {len(clustered):,} points, drawn from every cluster."
                     else:
                         commentary = "Not enough numeric columns for clustering visualization."
                         fig = None
@@ -233,16 +806,26 @@ class VisualizationAgent:
             else:
                 # Fallback visualization
                 numeric_cols = df.select_dtypes(include='number').columns
-                if len(numeric_cols) >= 2:
-                    fig = px.scatter(df, x=numeric_cols[0], y=numeric_cols[1],
+                if len(numeric_cols) >= 2 and len(df) > self.density_threshold:
+                    x, y, counts = density_grid(df[numeric_cols[0]], df[numeric_cols[1]], self.heatmap_bins)
+                    fig = go.Figure(go.Heatmap(x=x, y=y, z=counts, colorscale='Viridis', colorbar={'title': 'Rows'}))
+                    fig.update_layout(title=f'Density of {numeric_cols[0]} vs {numeric_cols[1]}',
+                                      xaxis_title=numeric_cols[0], yaxis_title=numeric_cols[1])
+                    commentary = (f"Generated a density heatmap for {numeric_cols[0]} vs {numeric_cols[1]} "
+                                  f"covering all {len(df):,} rows.")
+                elif len(numeric_cols) >= 2:
+                    shown = uniform_sample(df, self.point_budget)
+                    fig = px.scatter(shown, x=numeric_cols[0], y=numeric_cols[1],
                                      title=f'Scatter Plot of {numeric_cols[0]} vs {numeric_cols[1]}')
                     commentary = f"Generated a scatter plot for {numeric_cols[0]} vs {numeric_cols[1]}."
+                    if len(shown) < len(df):
+                        commentary += f" It shows a random sample of {len(shown):,} of {len(df):,} rows."
                 else:
                     commentary = "No suitable data for visualization."
                     fig = None
 
             if fig:
-                graphJSON = fig.to_json()
+                graphJSON = encode_figure(fig, binary=self.binary_figures)
             else:
                 graphJSON = None
 
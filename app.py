@@ -1,14 +1,37 @@
 import os
+import io
+import sys
+import time
+# The import time of the app, reported at /metrics, counts from here
+_import_started = time.perf_counter()
+import gzip
+import itertools
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash
+import tracemalloc
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g, Response
 import pandas as pd
-from agents import DataProcessingAgent, PreprocessingAgent, AnalysisAgent, VisualizationAgent
-import openai
+from clustering import ClusteringEngine
+from timeseries import TimeSeriesEngine
+from correlation import CorrelationEngine
+from sharding import ShardingEngine
+from agents import DataProcessingAgent, PreprocessingAgent, AnalysisAgent, VisualizationAgent, CLUSTER_LABELS_KEY
+from ingestion import read_csv_chunks
+from dataset_store import create_dataset_store
+from cache import create_result_cache, hash_stream, make_key, MemoryCacheBackend, ResultCache
+from intents import classify_query, normalize_query
+from jobs import create_job_queue, QueueFullError, DONE, FAILED
+from metrics import REGISTRY, span, start_trace, server_timing
+from result_tables import TABLE_SECTIONS, DEFAULT_PAGE_SIZE, table_page
 import json
 import re
-import time
+import uuid
 from typing import Tuple, Dict, Any  # Added 'Any' here
 
+try:
+    import brotli
+except ImportError:  # brotli is optional; responses fall back to gzip
+    brotli = None
+
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your_default_secret_key')
@@ -19,25 +42,230 @@ logger = logging.getLogger(__name__)
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'csv'}
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+MAX_FILE_SIZE = int(os.environ.get('MAX_UPLOAD_MB', 500)) * 1024 * 1024
+
+# Uploads larger than this are read and analyzed in chunks to bound memory
+STREAMING_THRESHOLD = int(os.environ.get('STREAMING_THRESHOLD_MB', 10)) * 1024 * 1024
+CSV_CHUNK_SIZE = int(os.environ.get('CSV_CHUNK_SIZE', 100_000))  # rows per chunk
+STREAMING_SAMPLE_ROWS = int(os.environ.get('STREAMING_SAMPLE_ROWS', 50_000))  # rows kept for quantiles, clustering and plots
+
+# Response compression for HTML and JSON bodies of at least COMPRESSION_MIN_BYTES
+COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSIBLE_MIMETYPES = {'text/html', 'application/json', 'text/css', 'application/javascript'}
+
+# Per-stage metrics served at /metrics; tracemalloc adds Python allocation peaks at a CPU cost
+METRICS_TRACEMALLOC = os.environ.get('METRICS_TRACEMALLOC', 'false').lower() == 'true'
+# Adds a Server-Timing header with the duration of every stage of the request
+METRICS_DEBUG_HEADER = os.environ.get('METRICS_DEBUG_HEADER', 'false').lower() == 'true'
+if METRICS_TRACEMALLOC and not tracemalloc.is_tracing():
+    tracemalloc.start()
+REQUEST_SECONDS = REGISTRY.histogram(
+    'analytiq_http_request_duration_seconds', 'Time to handle each HTTP request.',
+    label_names=('endpoint', 'method', 'status'),
+)
 
 def allowed_file(filename: str) -> bool:
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@app.context_processor
+def inject_upload_limits():
+    return {"max_upload_mb": MAX_FILE_SIZE // (1024 * 1024)}
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if METRICS_DEBUG_HEADER:
+        start_trace()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe(
+            elapsed, endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code
+        )
+        FIRST_REQUEST_SECONDS.setdefault(request.endpoint or 'unknown', elapsed)
+    if METRICS_DEBUG_HEADER:
+        timing = server_timing()
+        if timing:
+            response.headers['Server-Timing'] = timing
+    return response
+
+@app.after_request
+def compress_response(response):
+    """
+    Compress eligible responses with brotli when it is installed and accepted, otherwise gzip.
+    """
+    if (not COMPRESS_RESPONSES or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    if brotli is not None and request.accept_encodings['br']:
+        encoding, compress = 'br', lambda body: brotli.compress(body, quality=5)
+    elif request.accept_encodings['gzip']:
+        encoding, compress = 'gzip', lambda body: gzip.compress(body, compresslevel=6)
+    else:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return response
+
+    started = time.perf_counter()
+    compressed = compress(body)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = str(len(compressed))
+    response.vary.add('Accept-Encoding')
+    logger.info(f"Compressed {request.path} response with {encoding}: {len(body):,} -> {len(compressed):,} bytes "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms.")
+    return response
+
 # Custom Jinja2 filter to check if a value is numeric
 @app.template_filter('is_number')
 def is_number(value):
     return isinstance(value, (int, float))
 
 # Initialize agents
-data_processing_agent = DataProcessingAgent()
-preprocessing_agent = PreprocessingAgent()
-analysis_agent = AnalysisAgent()
-visualization_agent = VisualizationAgent()
+data_processing_agent = DataProcessingAgent(
+    key_columns=[col.strip() for col in os.environ.get('DEDUP_KEY_COLUMNS', '').split(',') if col.strip()],
+    spill_rows=int(os.environ['DEDUP_SPILL_ROWS']) if os.environ.get('DEDUP_SPILL_ROWS') else None,
+    spill_dir=os.environ.get('DEDUP_SPILL_DIR') or None,
+)
+preprocessing_agent = PreprocessingAgent(
+    category_threshold=float(os.environ.get('CATEGORY_THRESHOLD', 0.5)),
+    downcast_floats=os.environ.get('DOWNCAST_FLOATS', 'false').lower() == 'true',
+)
+analysis_agent = AnalysisAgent(
+    approximate=os.environ.get('APPROXIMATE_ANALYSIS', 'false').lower() == 'true',
+    quantile_k=int(os.environ.get('SKETCH_QUANTILE_K', 200)),
+    top_k=int(os.environ.get('SKETCH_TOP_K', 50)),
+    hll_precision=int(os.environ.get('SKETCH_HLL_PRECISION', 12)),
+    max_workers=int(os.environ.get('ANALYSIS_WORKERS', 3)),
+    analysis_timeout=float(os.environ['ANALYSIS_TIMEOUT']) if os.environ.get('ANALYSIS_TIMEOUT') else None,
+    clustering=ClusteringEngine(
+        n_clusters=int(os.environ.get('CLUSTER_COUNT', 3)),
+        select_k=os.environ.get('CLUSTER_SELECT_K', 'false').lower() == 'true',
+        k_range=(2, int(os.environ.get('CLUSTER_MAX_K', 8))),
+        max_features=int(os.environ.get('CLUSTER_MAX_FEATURES', 20)),
+        minibatch_rows=int(os.environ.get('CLUSTER_MINIBATCH_ROWS', 50_000)),
+    ),
+    time_series=TimeSeriesEngine(
+        date_columns=[col.strip() for col in os.environ.get('TIME_SERIES_DATE_COLUMNS', '').split(',') if col.strip()],
+        frequencies=[freq.strip() for freq in os.environ.get('TIME_SERIES_FREQUENCIES', 'M').split(',') if freq.strip()],
+        aggregates=[agg.strip() for agg in os.environ.get('TIME_SERIES_AGGREGATES', 'mean').split(',') if agg.strip()],
+    ),
+    correlation=CorrelationEngine(
+        wide_columns=int(os.environ.get('CORRELATION_WIDE_COLUMNS', 200)),
+        top_k=int(os.environ.get('CORRELATION_TOP_K', 100)),
+        threshold=float(os.environ['CORRELATION_THRESHOLD']) if os.environ.get('CORRELATION_THRESHOLD') else None,
+        max_pairs=int(os.environ.get('CORRELATION_MAX_PAIRS', 10_000)),
+        block_columns=int(os.environ.get('CORRELATION_BLOCK_COLUMNS', 256)),
+        max_mb=int(os.environ.get('CORRELATION_MAX_MB', 256)),
+    ),
+    sharding=ShardingEngine(
+        processes=int(os.environ.get('ANALYSIS_PROCESSES', 0)),
+        min_rows=int(os.environ.get('SHARDING_MIN_ROWS', 1_000_000)),
+        directory=os.environ.get('SHARDING_DIR') or None,
+    ),
+)
+visualization_agent = VisualizationAgent(
+    point_budget=int(os.environ.get('PLOT_POINT_BUDGET', 5000)),
+    density_threshold=int(os.environ.get('PLOT_DENSITY_THRESHOLD', 100_000)),
+    heatmap_bins=int(os.environ.get('PLOT_HEATMAP_BINS', 100)),
+    binary_figures=os.environ.get('FIGURE_ENCODING', 'binary').lower() == 'binary',
+)
+
+# Content-addressed result cache: 'memory' (per worker), 'disk' (shared by all workers) or 'none'
+result_cache = create_result_cache(
+    os.environ.get('RESULT_CACHE_BACKEND', 'memory'),
+    directory=os.environ.get('RESULT_CACHE_DIR', 'cache'),
+    max_mb=int(os.environ.get('RESULT_CACHE_MAX_MB', 256)),
+)
+
+# Sections of rendered analyses, served page by page to the tables of the analysis page:
+# 'disk' (shared by all workers), 'memory' (per worker) or 'none'
+analysis_tables = create_result_cache(
+    os.environ.get('ANALYSIS_TABLES_BACKEND', 'disk'),
+    directory=os.environ.get('RESULT_CACHE_DIR', 'cache'),
+    max_mb=int(os.environ.get('ANALYSIS_TABLES_MAX_MB', 256)),
+    filename='tables.sqlite3',
+)
+
+# Processed uploads stored as memory-mapped Arrow files, keyed by the upload hash ('' disables)
+dataset_store = create_dataset_store(
+    os.environ.get('DATASET_STORE_DIR', 'datasets'),
+    max_mb=int(os.environ.get('DATASET_STORE_MAX_MB', 2048)),
+)
+
+# Interpreted queries, keyed by the normalized query text
+query_cache = ResultCache(MemoryCacheBackend(
+    max_entries=int(os.environ.get('QUERY_CACHE_MAX_ENTRIES', 1024)),
+    ttl=int(os.environ.get('QUERY_CACHE_TTL', 3600)),
+))
+
+def collect_cache_metrics():
+    samples = []
+    for name, cache in (("result", result_cache), ("query", query_cache)):
+        if cache is None:
+            continue
+        stats = cache.stats()
+        samples.append(({"cache": name, "result": "hit"}, stats["hits"]))
+        samples.append(({"cache": name, "result": "miss"}, stats["misses"]))
+    return [("analytiq_cache_requests_total", "counter", "Cache lookups by cache and outcome.", samples)]
+
+REGISTRY.add_collector(collect_cache_metrics)
+
+# Startup cost of this process: seconds to import the app and to warm it up (see warmup), and
+# the duration of the first request to each endpoint
+STARTUP_SECONDS = {}
+FIRST_REQUEST_SECONDS = {}
+
+def collect_startup_metrics():
+    return [
+        ("analytiq_startup_seconds", "gauge", "Time spent starting the application, by phase.",
+         [({"phase": phase}, seconds) for phase, seconds in STARTUP_SECONDS.items()]),
+        ("analytiq_first_request_seconds", "gauge", "Duration of the first request to each endpoint.",
+         [({"endpoint": endpoint}, seconds) for endpoint, seconds in FIRST_REQUEST_SECONDS.items()]),
+    ]
+
+REGISTRY.add_collector(collect_startup_metrics)
+
+# Background analysis jobs with a bounded worker pool. The SQLite store is shared by all gunicorn
+# workers; with the memory store a status poll that reaches another worker finds no job.
+JOB_BACKEND = os.environ.get('JOB_BACKEND', 'sqlite')
+JOB_DIR = os.environ.get('JOB_DIR', 'jobs')
+job_queue = create_job_queue(
+    JOB_BACKEND,
+    directory=JOB_DIR,
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', 8)),
+    job_ttl=int(os.environ.get('JOB_TTL', 3600)),
+)
 
 # Load your OpenAI API key from an environment variable
-openai.api_key = os.environ.get('OPENAI_API_KEY')
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+
+def _openai():
+    """
+    The openai module, imported on the first query that needs the LLM: most queries are
+    answered by the local classifier or the query cache, and the import is slow.
+    """
+    import openai
+    openai.api_key = OPENAI_API_KEY
+    return openai
+
+def _openai_errors():
+    """
+    openai's RateLimitError and OpenAIError, for the retry loop of _interpret_query_with_llm. An
+    injected client that runs without openai imported cannot raise them, so nothing is caught.
+    """
+    openai = sys.modules.get('openai')
+    if openai is None:
+        return (), ()
+    return openai.error.RateLimitError, openai.error.OpenAIError
 
 # Define valid analysis keys
 VALID_ANALYSIS_KEYS = {
@@ -49,17 +277,48 @@ VALID_ANALYSIS_KEYS = {
     "clustering_analysis"
 }
 
-def interpret_query(user_query: str) -> Tuple[Dict[str, bool], str]:
+def interpret_query(user_query: str, client: Any = None) -> Tuple[Dict[str, bool], str]:
     """
     Uses OpenAI's ChatCompletion API to interpret the user's natural language query
     and determine which data analyses to perform.
+
+    Obvious queries are classified locally without a network round trip, and interpreted
+    queries are memoized by their normalized text.
     
     Args:
         user_query (str): The natural language query from the user.
+        client (Any, optional): Object with a ChatCompletion-style `create` method. Defaults to
+            `openai.ChatCompletion`; pass a stub to run offline.
     
     Returns:
         Tuple[Dict[str, bool], str]: A dictionary of analysis parameters and the AI's explanation.
     """
+    query_key = make_key("query", normalize_query(user_query))
+    cached = query_cache.get(query_key)
+    if cached is not None:
+        logger.info("Query served from the query cache.")
+        return dict(cached[0]), cached[1]
+
+    local = classify_query(user_query, sorted(VALID_ANALYSIS_KEYS), analysis_agent.time_series.frequencies)
+    if local is not None:
+        query_cache.set(query_key, local)
+        return local
+
+    with span("openai"):
+        analysis_params, openai_response_text, cacheable = _interpret_query_with_llm(user_query, client or _openai().ChatCompletion)
+    if cacheable:
+        query_cache.set(query_key, (analysis_params, openai_response_text))
+    return analysis_params, openai_response_text
+
+def _interpret_query_with_llm(user_query: str, client: Any) -> Tuple[Dict[str, bool], str, bool]:
+    """
+    Ask the LLM to interpret the query. The last element of the returned tuple tells whether the
+    answer is worth caching, i.e. whether the model actually answered.
+
+    `client` is `openai.ChatCompletion` or a stub with the same `create` method; only the former
+    needs openai imported.
+    """
+    rate_limit_error, api_error = _openai_errors()
     # Define the system prompt with JSON specification
     system_content = (
         "You are an assistant that helps determine which analyses to perform based on a user's query and provides insights. "
@@ -78,7 +337,7 @@ def interpret_query(user_query: str) -> Tuple[Dict[str, bool], str]:
 
     for attempt in range(retries):
         try:
-            response = openai.ChatCompletion.create(
+            response = client.create(
                 model="gpt-4",  # Updated model
                 messages=[
                     {"role": "system", "content": system_content},
@@ -88,17 +347,19 @@ def interpret_query(user_query: str) -> Tuple[Dict[str, bool], str]:
                 temperature=0.3,  # Lowered temperature for deterministic responses
             )
             break  # Exit the retry loop if successful
-        except openai.error.RateLimitError:
+        except rate_limit_error:
             logger.warning(f"Rate limit exceeded. Retrying in {backoff_factor ** attempt} seconds...")
             time.sleep(backoff_factor ** attempt)
-        except openai.error.OpenAIError as e:
+        except api_error as e:
             logger.error(f"OpenAI API error: {e}")
             flash('An error occurred while processing your request. Please try again later.', 'danger')
-            return analysis_params, "Error processing your query. Default analysis will be performed."
+            return analysis_params, "Error processing your query. Default analysis will be performed.", False
     else:
         # All retries failed
         flash('The service is currently unavailable. Please try again later.', 'danger')
-        return analysis_params, "Service is currently unavailable."
+        return analysis_params, "Service is currently unavailable.", False
+
+    cacheable = True
 
     try:
         ai_response = response['choices'][0]['message']['content'].strip()
@@ -132,13 +393,15 @@ def interpret_query(user_query: str) -> Tuple[Dict[str, bool], str]:
         flash('There was an issue interpreting your query. Default analysis will be performed.', 'warning')
         analysis_params["descriptive_statistics"] = True
         openai_response_text = "There was an issue interpreting your query. Default analysis will be performed."
+        cacheable = False
     except Exception as e:
         logger.error(f"Error interpreting AI response: {e}")
         flash('Error processing your query. Please try again.', 'danger')
         analysis_params["descriptive_statistics"] = True
         openai_response_text = "Error processing your query. Default analysis will be performed."
+        cacheable = False
 
-    return analysis_params, openai_response_text
+    return analysis_params, openai_response_text, cacheable
 
 def perform_analysis(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     """
@@ -147,140 +410,685 @@ def perform_analysis(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     2. Preprocessing
     3. Data Analysis
     4. Data Visualization
+
+    When a "dataset_hash" is provided and the result cache is enabled, every analysis section and
+    the visualization are cached under the hash and the normalized parameters, and only the
+    sections missing from the cache are computed.
+
+    When the dataset store is enabled, the processed dataset is stored under the hash. Passing
+    neither a dataframe nor chunks analyzes the stored dataset instead, reading only the columns
+    the requested analyses need, or from its saved aggregates once rows have been appended to it.
     
     Args:
-        data (Dict[str, Any]): A dictionary containing dataframe, analysis parameters, styling parameters, and OpenAI response text.
+        data (Dict[str, Any]): A dictionary containing a dataframe (or an iterator of dataframe chunks
+            under "chunks"), analysis parameters, styling parameters, and OpenAI response text, plus an
+            optional "progress" callable that is told the name of each stage as it starts.
     
     Returns:
         Tuple[Dict[str, Any], int]: A dictionary with analysis results and an HTTP status code.
     """
     df = data.get("dataframe")
+    chunks = data.get("chunks")
+    dataset_hash = data.get("dataset_hash")
     analysis_params = data.get("analysis_params", {})
     styling_params = data.get("styling_params", "Default styling.")
     openai_response_text = data.get("openai_response_text", "No OpenAI query provided.")
+    progress = data.get("progress") or (lambda stage: None)
 
-    if df is None:
+    stored = state = None
+    if df is None and chunks is None and dataset_store is not None and dataset_hash is not None:
+        stored = dataset_store.metadata(dataset_hash)
+    if stored is not None and stored["settings"] != _dataset_settings(stored["streamed"]):
+        stored = None
+    if df is None and chunks is None and stored is None:
         logger.error("No dataset provided.")
         return {"error": "No dataset provided."}, 400
+    if stored is not None:
+        state = dataset_store.load_state(dataset_hash, _analysis_fingerprint(streaming=True))
+    streaming = chunks is not None or (stored is not None and (stored["streamed"] or state is not None))
+    # A dataset with appended rows is only changed by appends, never replaced by its original upload
+    store_dataset = dataset_store is not None and dataset_hash is not None and stored is None \
+        and dataset_store.revision(dataset_hash) == dataset_hash
+    dataset_id = dataset_hash if dataset_store is not None else None
+    # Results are cached per revision, so appending rows to a stored dataset invalidates them
+    revision = dataset_store.revision(dataset_hash) if stored is not None else dataset_hash
 
-    # Step 1: Data Processing
-    try:
-        logger.info("Starting data processing.")
-        processed_data = data_processing_agent.process(df)
-        processed_data = preprocessing_agent.preprocess(processed_data)
-        logger.info("Data processing completed successfully.")
-    except Exception as e:
-        logger.error(f"DataProcessingAgent failed: {e}")
-        return {"error": "Data processing failed."}, 500
+    # Look up cached sections and visualization
+    requested = sorted(key for key in VALID_ANALYSIS_KEYS if analysis_params.get(key, False))
+    use_cache = result_cache is not None and dataset_hash is not None
+    fingerprint = _analysis_fingerprint(streaming=streaming)
+    cached_results, visualization = {}, None
+    if use_cache:
+        for key in requested:
+            section = result_cache.get(make_key(revision, "section", key, fingerprint))
+            if section is not None:
+                cached_results[key] = section
+        visualization_key = make_key(
+            revision, "visualization", requested, styling_params, fingerprint, visualization_agent.settings()
+        )
+        visualization = result_cache.get(visualization_key)
+        plots_clusters = "clustering_analysis" in requested and not any(
+            key in requested for key in ("descriptive_statistics", "correlation_matrix", "time_series_analysis")
+        )
+        if visualization is None and plots_clusters:
+            # The cluster scatter plot needs the per-row labels that only a fresh clustering run returns
+            cached_results.pop("clustering_analysis", None)
+        if cached_results:
+            logger.info(f"Result cache hit for sections: {', '.join(cached_results)}.")
+        if len(cached_results) == len(requested) and visualization is not None:
+            logger.info("Serving analysis entirely from the result cache.")
+            return _build_response(cached_results, visualization, openai_response_text, dataset_id), 200
 
-    # Step 2: Data Analysis
-    try:
-        logger.info("Starting data analysis.")
-        analysis_results = analysis_agent.analyze(processed_data, analysis_params)
-        logger.info("Data analysis completed successfully.")
-    except Exception as e:
-        logger.error(f"AnalysisAgent failed: {e}")
-        return {"error": "Data analysis failed."}, 500
+    missing_params = {key: key in requested and key not in cached_results for key in VALID_ANALYSIS_KEYS}
+
+    if state is not None:
+        # Steps 1 and 2: Rows were appended to the stored dataset, whose aggregates are kept up to date
+        try:
+            progress("analysis")
+            logger.info(f"Analyzing stored dataset {dataset_hash} from its saved aggregates.")
+            with span("analysis", rows=state.n_rows):
+                analysis_results, processed_data = analysis_agent.aggregate_results(state, missing_params)
+            logger.info("Data analysis completed successfully.")
+        except Exception as e:
+            logger.error(f"Analysis of stored dataset failed: {e}")
+            return {"error": "Data analysis failed."}, 500
+    elif stored is not None:
+        # Steps 1 and 2: The stored dataset is already processed; read only the columns needed
+        try:
+            progress("analysis")
+            columns = analysis_agent.required_columns(dataset_store.dtypes(dataset_hash), missing_params)
+            logger.info(f"Analyzing stored dataset {dataset_hash} "
+                        f"({'all' if columns is None else len(columns)} columns).")
+            if streaming:
+                with span("streaming_analysis", columns=None if columns is None else len(columns)):
+                    analysis_results, processed_data = analysis_agent.analyze_chunks(
+                        dataset_store.iter_chunks(dataset_hash, columns), missing_params,
+                        sample_rows=STREAMING_SAMPLE_ROWS
+                    )
+            else:
+                with span("load", columns=None if columns is None else len(columns)):
+                    processed_data = dataset_store.load(dataset_hash, columns)
+                with span("analysis", rows=len(processed_data), columns=processed_data.shape[1]):
+                    analysis_results = analysis_agent.analyze(processed_data, missing_params)
+            logger.info("Data analysis completed successfully.")
+        except Exception as e:
+            logger.error(f"Analysis of stored dataset failed: {e}")
+            return {"error": "Data analysis failed."}, 500
+    elif chunks is not None:
+        # Steps 1 and 2: Streaming processing and analysis, chunk by chunk
+        try:
+            progress("analysis")
+            logger.info("Starting streaming data processing and analysis.")
+            row_index = data_processing_agent.row_index()
+            processed_chunks = preprocessing_agent.preprocess_chunks(
+                data_processing_agent.process_chunks(chunks, row_index=row_index)
+            )
+            if store_dataset:
+                processed_chunks = dataset_store.write_chunks(
+                    dataset_hash, processed_chunks, settings=_dataset_settings(streamed=True), row_index=row_index
+                )
+            # Processing, storing and analysis are interleaved chunk by chunk, so they are timed together
+            with span("streaming_analysis"):
+                analysis_results, processed_data = analysis_agent.analyze_chunks(
+                    processed_chunks, missing_params, sample_rows=STREAMING_SAMPLE_ROWS
+                )
+            logger.info("Streaming data analysis completed successfully.")
+        except Exception as e:
+            logger.error(f"Streaming analysis failed: {e}")
+            return {"error": "Data analysis failed."}, 500
+    else:
+        # Step 1: Data Processing
+        try:
+            progress("processing")
+            logger.info("Starting data processing.")
+            # The row fingerprints are stored with the dataset, for deduplicating appended rows
+            row_index = data_processing_agent.row_index()
+            with span("processing", rows=len(df), columns=df.shape[1]):
+                processed_data = data_processing_agent.process(df, row_index=row_index)
+            with span("preprocessing", rows=len(processed_data), columns=processed_data.shape[1]):
+                processed_data = preprocessing_agent.preprocess(processed_data)
+            logger.info("Data processing completed successfully.")
+        except Exception as e:
+            logger.error(f"DataProcessingAgent failed: {e}")
+            return {"error": "Data processing failed."}, 500
+
+        if store_dataset:
+            try:
+                with span("store", rows=len(processed_data), columns=processed_data.shape[1]):
+                    dataset_store.put(
+                        dataset_hash, processed_data, settings=_dataset_settings(streamed=False),
+                        row_index=row_index
+                    )
+            except Exception as e:
+                logger.error(f"Failed to store dataset {dataset_hash}: {e}")
+
+        # Step 2: Data Analysis
+        try:
+            progress("analysis")
+            logger.info("Starting data analysis.")
+            with span("analysis", rows=len(processed_data), columns=processed_data.shape[1]):
+                analysis_results = analysis_agent.analyze(processed_data, missing_params)
+            logger.info("Data analysis completed successfully.")
+        except Exception as e:
+            logger.error(f"AnalysisAgent failed: {e}")
+            return {"error": "Data analysis failed."}, 500
+
+    cluster_labels = analysis_results.pop(CLUSTER_LABELS_KEY, None)
+    if use_cache:
+        for key, section in analysis_results.items():
+            result_cache.set(make_key(revision, "section", key, fingerprint), section)
+    analysis_results = {**cached_results, **analysis_results}
 
     # Step 3: Data Visualization
-    try:
-        logger.info("Starting data visualization.")
-        graphJSON, commentary = visualization_agent.visualize(processed_data, analysis_results, styling_params)
-        logger.info("Data visualization completed successfully.")
-    except Exception as e:
-        logger.error(f"VisualizationAgent failed: {e}")
-        return {"error": "Data visualization failed."}, 500
+    if visualization is None:
+        try:
+            progress("visualization")
+            logger.info("Starting data visualization.")
+            with span("visualization", rows=len(processed_data), columns=processed_data.shape[1]):
+                visualization = visualization_agent.visualize(
+                    processed_data, analysis_results, styling_params, cluster_labels=cluster_labels
+                )
+            logger.info("Data visualization completed successfully.")
+        except Exception as e:
+            logger.error(f"VisualizationAgent failed: {e}")
+            return {"error": "Data visualization failed."}, 500
+        if use_cache and all(key in analysis_results for key in requested):
+            # Sections dropped after a timeout would change the chart, so only complete runs are cached
+            result_cache.set(visualization_key, visualization)
+
+    return _build_response(analysis_results, visualization, openai_response_text, dataset_id), 200
+
+def _dataset_settings(streamed: bool) -> Dict[str, Any]:
+    """
+    Settings that change the processed dataset; a stored dataset built with other settings is rebuilt.
+    """
+    settings = {
+        "dedup_key_columns": data_processing_agent.key_columns,
+        "inference_rows": preprocessing_agent.inference_rows,
+        "category_threshold": preprocessing_agent.category_threshold,
+        "downcast_floats": preprocessing_agent.downcast_floats,
+        "streamed": streamed,
+    }
+    if streamed:
+        settings.update(chunk_size=CSV_CHUNK_SIZE)
+    return settings
+
+def _is_stored(dataset_hash: str, file_length: int) -> bool:
+    """
+    Whether the processed dataset for this upload is in the dataset store, so it need not be parsed.
+    """
+    if dataset_store is None or dataset_hash is None:
+        return False
+    return dataset_store.contains(dataset_hash, _dataset_settings(streamed=file_length > STREAMING_THRESHOLD))
 
-    # Prepare response
-    response = {
+def _analysis_fingerprint(streaming: bool) -> Dict[str, Any]:
+    """
+    Settings that change the analysis output, folded into every result cache key.
+    """
+    fingerprint = {
+        "approximate": analysis_agent.approximate,
+        "quantile_k": analysis_agent.quantile_k,
+        "top_k": analysis_agent.top_k,
+        "hll_precision": analysis_agent.hll_precision,
+        "downcast_floats": preprocessing_agent.downcast_floats,
+        "dedup_key_columns": data_processing_agent.key_columns,
+        "clustering": analysis_agent.clustering.settings(),
+        "time_series": analysis_agent.time_series.settings(),
+        "correlation": analysis_agent.correlation.settings(),
+        "streaming": streaming,
+    }
+    if streaming:
+        fingerprint.update(chunk_size=CSV_CHUNK_SIZE, sample_rows=STREAMING_SAMPLE_ROWS)
+    return fingerprint
+
+def _build_response(analysis_results: Dict[str, Any], visualization: Tuple[Any, str],
+                    openai_response_text: str, dataset_id: str = None) -> Dict[str, Any]:
+    graphJSON, commentary = visualization
+    return {
         "analysis": analysis_results,
         "commentary": commentary,
         "graphJSON": graphJSON,
-        "openai_response_text": openai_response_text
+        "openai_response_text": openai_response_text,
+        "dataset_id": dataset_id
     }
 
-    return response, 200
+def _validate_upload() -> Tuple[Any, int, Tuple[str, str]]:
+    """
+    Check the uploaded dataset in the current request.
+
+    Returns:
+        Tuple[Any, int, Tuple[str, str]]: The file, its size in bytes, and an (error message, flash
+        category) pair, which is None when the upload is valid.
+    """
+    # Handle file upload
+    if 'dataset' not in request.files:
+        return None, 0, ('No file part in the form.', 'danger')
+
+    file = request.files['dataset']
+
+    # If user does not select file, browser may submit an empty part
+    if file.filename == '':
+        return None, 0, ('No selected file.', 'danger')
+
+    if not allowed_file(file.filename):
+        return None, 0, ('Allowed file types are CSV.', 'warning')
+
+    # Validate file size
+    file.seek(0, os.SEEK_END)
+    file_length = file.tell()
+    if file_length > MAX_FILE_SIZE:
+        return None, 0, (f'File size exceeds the limit of {MAX_FILE_SIZE // (1024 * 1024)} MB.', 'danger')
+    file.seek(0)  # Reset file pointer after checking size
+    return file, file_length, None
+
+def _hash_upload(file) -> str:
+    """
+    SHA-256 of the upload when the result cache or the dataset store needs it, otherwise None.
+    """
+    if result_cache is None and dataset_store is None:
+        return None
+    return hash_stream(file)
+
+def _load_dataset(source, file_length: int) -> Tuple[Any, Any]:
+    """
+    Read small files directly into a DataFrame and large ones lazily in chunks.
+
+    Returns:
+        Tuple[Any, Any]: The DataFrame and the chunk iterator; exactly one of them is None.
+    """
+    if file_length > STREAMING_THRESHOLD:
+        logger.info("Dataset uploaded; reading in chunks.")
+        return None, read_csv_chunks(source, chunksize=CSV_CHUNK_SIZE)
+    df = pd.read_csv(source)
+    logger.info("Dataset uploaded and read successfully.")
+    return df, None
+
+def _read_analysis_form() -> Tuple[Dict[str, bool], str, str]:
+    """
+    Read the analysis parameters, the OpenAI response text and the styling parameters from the form.
+    """
+    user_query = request.form.get('user_query', '').strip()
+
+    if user_query:
+        # Interpret the user's natural language query
+        analysis_params, openai_response_text = interpret_query(user_query)
+    else:
+        # Get analysis parameters from the form
+        analysis_params = {
+            key: key in request.form
+            for key in VALID_ANALYSIS_KEYS
+        }
+        openai_response_text = "No query was provided."
+
+    # Get styling parameters
+    styling_params = request.form.get('styling_params', 'Default styling.')
+    return analysis_params, openai_response_text, styling_params
+
+def _render_result(result: Dict[str, Any], result_id: str = None):
+    """
+    Render the analysis page. The result tables are saved under `result_id` (a new id by
+    default) and the page loads them page by page from /results, so its size does not depend
+    on the size of the results.
+    """
+    analysis = result.get("analysis", {})
+    commentary = result.get("commentary", "")
+    graphJSON = result.get("graphJSON", None)
+    openai_response_text = result.get("openai_response_text", "No response from OpenAI.")
+    sections = {key: title for key, title in TABLE_SECTIONS.items() if analysis.get(key)}
+    result_id = _save_tables(result_id or uuid.uuid4().hex, analysis, sections)
+    with span("render"):
+        return render_template('analysis.html',
+                               sections=sections,
+                               result_id=result_id,
+                               page_size=DEFAULT_PAGE_SIZE,
+                               commentary=commentary,
+                               graphJSON=graphJSON,
+                               openai_response_text=openai_response_text,
+                               dataset_id=result.get("dataset_id"))
+
+def _save_tables(result_id: str, analysis: Dict[str, Any], sections: Dict[str, str]) -> str:
+    """
+    Save the table sections of an analysis, one entry per section. Returns `result_id`, or None
+    when the tables cannot be served.
+    """
+    if analysis_tables is None:
+        return None
+    with span("save_tables"):
+        for key in sections:
+            analysis_tables.set(make_key("table", result_id, key), analysis[key])
+    return result_id
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        # Handle file upload
-        if 'dataset' not in request.files:
-            flash('No file part in the form.', 'danger')
-            return redirect(request.url)
-
-        file = request.files['dataset']
-
-        # If user does not select file, browser may submit an empty part
-        if file.filename == '':
-            flash('No selected file.', 'danger')
+        file, file_length, error = _validate_upload()
+        if error:
+            flash(*error)
             return redirect(request.url)
+        dataset_hash = _hash_upload(file)
 
-        if file and allowed_file(file.filename):
-            # Validate file size
-            file.seek(0, os.SEEK_END)
-            file_length = file.tell()
-            if file_length > MAX_FILE_SIZE:
-                flash('File size exceeds the limit of 10 MB.', 'danger')
-                return redirect(request.url)
-            file.seek(0)  # Reset file pointer after checking size
-
-            # Read the uploaded file directly into a DataFrame
+        if _is_stored(dataset_hash, file_length):
+            # Already processed and stored, so the CSV is not parsed again
+            df, chunks = None, None
+        else:
             try:
-                df = pd.read_csv(file)
-                logger.info("Dataset uploaded and read successfully.")
+                df, chunks = _load_dataset(file, file_length)
             except Exception as e:
                 logger.error(f"Failed to read CSV file: {e}")
                 flash('Failed to read CSV file. Please ensure it is a valid CSV.', 'danger')
                 return redirect(request.url)
 
-            user_query = request.form.get('user_query', '').strip()
+        analysis_params, openai_response_text, styling_params = _read_analysis_form()
 
-            if user_query:
-                # Interpret the user's natural language query
-                analysis_params, openai_response_text = interpret_query(user_query)
-            else:
-                # Get analysis parameters from the form
-                analysis_params = {
-                    key: key in request.form
-                    for key in VALID_ANALYSIS_KEYS
-                }
-                openai_response_text = "No query was provided."
-
-            # Get styling parameters
-            styling_params = request.form.get('styling_params', 'Default styling.')
-
-            # Prepare data to send to analysis function
-            data = {
-                "dataframe": df,
-                "analysis_params": analysis_params,
-                "styling_params": styling_params,
-                "openai_response_text": openai_response_text
-            }
-
-            # Call the analysis function directly
-            result, status_code = perform_analysis(data)
-            if status_code == 200:
-                analysis = result.get("analysis", {})
-                commentary = result.get("commentary", "")
-                graphJSON = result.get("graphJSON", None)
-                openai_response_text = result.get("openai_response_text", "No response from OpenAI.")
-                return render_template('analysis.html',
-                                       analysis=analysis,
-                                       commentary=commentary,
-                                       graphJSON=graphJSON,
-                                       openai_response_text=openai_response_text)
-            else:
-                flash(result.get("error", "An error occurred while processing your request."), 'danger')
-                logger.error(f"Analysis Error: {result.get('error')}")
-                return redirect(request.url)
+        # Prepare data to send to analysis function
+        data = {
+            "dataframe": df,
+            "chunks": chunks,
+            "dataset_hash": dataset_hash,
+            "analysis_params": analysis_params,
+            "styling_params": styling_params,
+            "openai_response_text": openai_response_text
+        }
 
+        # Call the analysis function directly
+        result, status_code = perform_analysis(data)
+        if status_code == 200:
+            return _render_result(result)
         else:
-            flash('Allowed file types are CSV.', 'warning')
+            flash(result.get("error", "An error occurred while processing your request."), 'danger')
+            logger.error(f"Analysis Error: {result.get('error')}")
             return redirect(request.url)
 
     return render_template('index.html')
 
+def _run_analysis_job(progress, path: str, file_length: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Job body: load the saved upload, run the analysis pipeline and remove the upload afterwards.
+    Without a saved upload (`path` is None) the job analyzes the stored dataset.
+    """
+    data["progress"] = progress
+    if path is None:
+        result, status_code = perform_analysis(data)
+    else:
+        try:
+            with open(path, 'rb') as source:
+                data["dataframe"], data["chunks"] = _load_dataset(source, file_length)
+                result, status_code = perform_analysis(data)
+        finally:
+            os.remove(path)
+    if status_code != 200:
+        raise Exception(result.get("error", "Analysis failed."))
+    return result
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue an analysis of the uploaded dataset and return its job id (HTTP 202), or HTTP 429 with
+    a Retry-After header when the queue is full.
+    """
+    file, file_length, error = _validate_upload()
+    if error:
+        return jsonify({"error": error[0]}), 400
+    dataset_hash = _hash_upload(file)
+    analysis_params, openai_response_text, styling_params = _read_analysis_form()
+
+    path = None
+    if not _is_stored(dataset_hash, file_length):
+        # The request stream is gone once the response is sent, so the job reads a saved copy
+        upload_dir = os.path.join(JOB_DIR, 'uploads')
+        os.makedirs(upload_dir, exist_ok=True)
+        path = os.path.join(upload_dir, f"{uuid.uuid4().hex}.csv")
+        file.save(path)
+
+    data = {
+        "dataset_hash": dataset_hash,
+        "analysis_params": analysis_params,
+        "styling_params": styling_params,
+        "openai_response_text": openai_response_text
+    }
+    try:
+        job_id = job_queue.submit(_run_analysis_job, path, file_length, data)
+    except QueueFullError as e:
+        if path is not None:
+            os.remove(path)
+        logger.warning(f"Rejected analysis job: {e}")
+        response = jsonify({"error": "The server is busy. Please try again shortly."})
+        response.status_code = 429
+        response.headers['Retry-After'] = '30'
+        return response
+
+    return jsonify({
+        "job_id": job_id,
+        "dataset_id": dataset_hash if dataset_store is not None else None,
+        "status_url": url_for('job_status', job_id=job_id),
+        "result_url": url_for('job_result', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify({key: job[key] for key in ('id', 'status', 'stage', 'progress', 'error')})
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id: str):
+    job = job_queue.get(job_id, result=True)
+    if job is None:
+        flash('Analysis job not found. It may have expired.', 'warning')
+        return redirect(url_for('index'))
+    if job['status'] == FAILED:
+        flash(job['error'] or 'An error occurred while processing your request.', 'danger')
+        return redirect(url_for('index'))
+    if job['status'] != DONE:
+        return jsonify({key: job[key] for key in ('id', 'status', 'stage', 'progress')}), 202
+    return _render_result(job['result'], result_id=job_id)
+
+@app.route('/datasets/<dataset_id>/analysis', methods=['POST'])
+def analyze_dataset(dataset_id: str):
+    """
+    Run a follow-up analysis on a stored dataset without uploading it again. Takes the same
+    analysis form fields as the upload form.
+    """
+    if dataset_store is None or dataset_store.metadata(dataset_id) is None:
+        flash('Dataset not found. Please upload it again.', 'warning')
+        return redirect(url_for('index'))
+
+    analysis_params, openai_response_text, styling_params = _read_analysis_form()
+    result, status_code = perform_analysis({
+        "dataset_hash": dataset_id,
+        "analysis_params": analysis_params,
+        "styling_params": styling_params,
+        "openai_response_text": openai_response_text
+    })
+    if status_code == 200:
+        return _render_result(result)
+    flash(result.get("error", "An error occurred while processing your request."), 'danger')
+    return redirect(url_for('index'))
+
+@app.route('/datasets/<dataset_id>/append', methods=['POST'])
+def append_dataset(dataset_id: str):
+    """
+    Append the rows of an uploaded CSV to a stored dataset and show the refreshed analysis.
+    Takes the upload form fields. Rows the dataset already has are skipped, so the upload can be
+    the previous file plus new rows, and the analysis aggregates saved with the dataset are
+    updated with the new rows only.
+    """
+    stored = dataset_store.metadata(dataset_id) if dataset_store is not None else None
+    if stored is None or stored["settings"] != _dataset_settings(stored["streamed"]):
+        flash('Dataset not found. Please upload it again.', 'warning')
+        return redirect(url_for('index'))
+
+    file, file_length, error = _validate_upload()
+    if error:
+        flash(*error)
+        return redirect(url_for('index'))
+
+    try:
+        appended_rows = _append_rows(dataset_id, file)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('index'))
+    except Exception as e:
+        logger.error(f"Failed to append to dataset {dataset_id}: {e}")
+        flash('Failed to append the file. Please ensure it is a valid CSV.', 'danger')
+        return redirect(url_for('index'))
+    logger.info(f"Appended {appended_rows} new rows to dataset {dataset_id}.")
+
+    analysis_params, openai_response_text, styling_params = _read_analysis_form()
+    result, status_code = perform_analysis({
+        "dataset_hash": dataset_id,
+        "analysis_params": analysis_params,
+        "styling_params": styling_params,
+        "openai_response_text": openai_response_text
+    })
+    if status_code == 200:
+        return _render_result(result)
+    flash(result.get("error", "An error occurred while processing your request."), 'danger')
+    return redirect(url_for('index'))
+
+def _append_rows(dataset_id: str, file) -> int:
+    """
+    Deduplicate the uploaded rows against the row index of the stored dataset, store the new
+    ones as a part of the dataset and fold them into its saved aggregates.
+
+    The first append builds the aggregates with one pass over the stored dataset; every later
+    append only reads the upload.
+
+    Returns:
+        int: The number of rows appended.
+    """
+    upload_hash = hash_stream(file)
+    with dataset_store.lock(dataset_id), span("append"):
+        settings = _analysis_fingerprint(streaming=True)
+        aggregates = dataset_store.load_state(dataset_id, settings)
+        if aggregates is None:
+            aggregates = analysis_agent.aggregate_chunks(
+                dataset_store.iter_chunks(dataset_id), sample_rows=STREAMING_SAMPLE_ROWS
+            )
+        rows_before = aggregates.n_rows
+        dtypes = dataset_store.dtypes(dataset_id)
+        row_index = dataset_store.row_index(dataset_id)
+        chunks = _align_columns(read_csv_chunks(file, chunksize=CSV_CHUNK_SIZE), dtypes.index)
+        processed_chunks = preprocessing_agent.preprocess_chunks(
+            data_processing_agent.process_chunks(chunks, row_index=row_index), dtypes=dtypes
+        )
+        analysis_agent.aggregate_chunks(
+            dataset_store.append_chunks(dataset_id, processed_chunks, row_index, upload_hash),
+            aggregates=aggregates
+        )
+        dataset_store.save_state(dataset_id, aggregates, settings)
+        return aggregates.n_rows - rows_before
+
+def _align_columns(chunks, columns):
+    """
+    Put the columns of every chunk in the order of `columns`, which row fingerprints depend on.
+    Raises ValueError when the file has other columns.
+    """
+    first_chunk = next(chunks, None)
+    if first_chunk is None or sorted(map(str, first_chunk.columns)) != sorted(map(str, columns)):
+        raise ValueError("The appended file must have the same columns as the dataset.")
+    return (chunk[list(columns)] for chunk in itertools.chain([first_chunk], chunks))
+
+@app.route('/results/<result_id>/<section>', methods=['GET'])
+def result_table(result_id: str, section: str):
+    """
+    One page of a result table of the analysis page, as JSON. Query parameters: `offset` and
+    `limit` (rows), `column_offset` and `column_limit` (correlation matrix columns) and `column`
+    (value counts).
+    """
+    if section not in TABLE_SECTIONS or analysis_tables is None:
+        return jsonify({"error": "Unknown result table."}), 404
+    data = analysis_tables.get(make_key("table", result_id, section))
+    if data is None:
+        return jsonify({"error": "Results not found. They may have expired; please run the analysis again."}), 404
+    try:
+        page = table_page(
+            section, data,
+            offset=request.args.get('offset', 0, type=int),
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+            column_offset=request.args.get('column_offset', 0, type=int),
+            column_limit=request.args.get('column_limit', DEFAULT_PAGE_SIZE, type=int),
+            column=request.args.get('column'),
+        )
+    except KeyError:
+        return jsonify({"error": "Unknown column."}), 404
+    return jsonify(page)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics of this worker: per-stage durations and memory, request durations and
+    cache hit counts.
+    """
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# Rows of the synthetic dataset analyzed by warmup
+WARMUP_ROWS = 500
+
+def preload() -> float:
+    """
+    Import the libraries that are otherwise imported on first use, compile the templates and
+    build one Plotly figure, which loads Plotly's templates and validators.
+
+    gunicorn.conf.py calls this in the gunicorn master when the app is preloaded, so that the
+    forked workers share these pages. It only imports and runs single-threaded Python: a process
+    must not be forked after it has started threads (the analysis pools, BLAS or OpenMP threads),
+    as the children could inherit locks held by them. The analyses are warmed up by warmup(),
+    in each worker.
+
+    Returns:
+        float: The seconds the preload took.
+    """
+    started = time.perf_counter()
+    analysis_agent.clustering.preload()
+    _openai()
+    import plotly.express as px
+    px.bar(x=["a", "b"], y=[1, 2], title="Preload").to_plotly_json()
+    for template in ('index.html', 'analysis.html'):
+        app.jinja_env.get_template(template)
+
+    STARTUP_SECONDS["preload"] = time.perf_counter() - started
+    logger.info(f"Preloaded in {STARTUP_SECONDS['preload']:.2f}s.")
+    return STARTUP_SECONDS["preload"]
+
+def warmup() -> float:
+    """
+    Prime this process before it serves requests: preload(), then run a small synthetic dataset
+    through reading, processing, every analysis and visualization, so the first request does not
+    pay for the first-call initialization of pandas, scikit-learn and Plotly.
+
+    This starts the analysis threads, so gunicorn.conf.py calls it in each worker after the fork
+    (post_fork), never in the master. No dataset hash is passed, so nothing is cached or stored.
+
+    Returns:
+        float: The seconds the warmup took.
+    """
+    started = time.perf_counter()
+    if "preload" not in STARTUP_SECONDS:
+        preload()
+
+    lines = ["id,value,score,category,date"]
+    lines.extend(
+        f"{i},{(i * 37) % 101 / 7:.3f},{i % 13},{'abc'[i % 3]},2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+        for i in range(WARMUP_ROWS)
+    )
+    csv = "\n".join(lines).encode()
+    df, chunks = _load_dataset(io.BytesIO(csv), len(csv))
+    result, status_code = perform_analysis({
+        "dataframe": df,
+        "chunks": chunks,
+        "analysis_params": {key: True for key in VALID_ANALYSIS_KEYS},
+        "styling_params": "Default styling.",
+        "openai_response_text": "Warmup.",
+    })
+    if status_code != 200:
+        logger.warning(f"Warmup analysis failed: {result.get('error')}")
+
+    STARTUP_SECONDS["warmup"] = time.perf_counter() - started
+    logger.info(f"Warmed up in {STARTUP_SECONDS['warmup']:.2f}s.")
+    return STARTUP_SECONDS["warmup"]
+
 # Error Handlers
 @app.errorhandler(404)
 def page_not_found(e):
@@ -294,5 +1102,7 @@ def internal_error(e):
     flash('An internal error occurred. Please try again later.', 'danger')
     return render_template('index.html'), 500
 
+STARTUP_SECONDS["import"] = time.perf_counter() - _import_started
+
 if __name__ == '__main__':
     app.run(port=5000, debug=False)
@@ -0,0 +1,240 @@
+"""
+Time and measure every stage of the analysis pipeline on a synthetic dataset.
+
+Usage: python benchmarks/bench_pipeline.py [--rows 100000] [--columns 12] [--repeat 3]
+       [--output results.json] [--baseline previous.json] [dataset options of datagen.py]
+
+Stages: reading the CSV, DataProcessingAgent.process, PreprocessingAgent.preprocess, every
+AnalysisAgent.analyze branch on its own and all together, VisualizationAgent.visualize,
+perform_analysis, and a whole upload request with interpret_query stubbed out. Each stage is
+timed `--repeat` times and run once more under tracemalloc for its peak Python allocations;
+the payload size is the JSON size of what the stage returns.
+
+The agents are the ones app.py configures, so the usual environment variables apply. The result
+cache and dataset store are disabled so every repetition does the full work. Results are written
+as JSON; pass an earlier file as --baseline to compare two commits.
+"""
+import os
+import io
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from datagen import add_arguments, cached_csv, dataset_params  # noqa: E402
+from metrics import traced_peak  # noqa: E402
+
+
+def payload_bytes(value):
+    """
+    Size of `value` as JSON, with non-string keys such as period timestamps written as strings.
+    """
+    def keys_as_strings(item):
+        if isinstance(item, dict):
+            return {str(key): keys_as_strings(inner) for key, inner in item.items()}
+        if isinstance(item, (list, tuple)):
+            return [keys_as_strings(inner) for inner in item]
+        return item
+    return len(json.dumps(keys_as_strings(value), default=str).encode())
+
+
+def measure(fn, setup=lambda: (), repeat=3, trace_memory=True):
+    """
+    Time fn(*setup()) `repeat` times; the setup is not timed. With `trace_memory`, one more run
+    under tracemalloc gives the peak allocations above the start of the run.
+
+    Returns:
+        (dict, Any): The measurements and the result of the last run.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup()
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - started)
+    measurement = {
+        'min_seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'runs': repeat,
+    }
+    if trace_memory:
+        args = setup()
+        already_tracing = tracemalloc.is_tracing()  # e.g. METRICS_TRACEMALLOC
+        if not already_tracing:
+            tracemalloc.start()
+        try:
+            # The pipeline's own metrics spans reset the tracemalloc peak; traced_peak accounts for that
+            with traced_peak() as traced:
+                result = fn(*args)
+            measurement['peak_traced_bytes'] = traced['bytes']
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+    return measurement, result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def run(args):
+    # Configure the app before importing it: no caching, no stored datasets
+    os.environ['RESULT_CACHE_BACKEND'] = 'none'
+    os.environ['DATASET_STORE_DIR'] = ''
+    import app  # noqa: E402 (reads its configuration at import time)
+
+    params = dataset_params(args)
+    path = cached_csv(args.data_dir, **params)
+    all_keys = sorted(app.VALID_ANALYSIS_KEYS)
+    all_params = {key: True for key in all_keys}
+    stages = {}
+
+    def record(name, fn, setup=lambda: (), payload=None):
+        measurement, result = measure(fn, setup, repeat=args.repeat, trace_memory=not args.no_memory)
+        if payload is not None:
+            measurement['payload_bytes'] = payload(result)
+        stages[name] = measurement
+        print(f"{name:<40} {measurement['min_seconds'] * 1000:>10.1f} ms"
+              + (f" {measurement['peak_traced_bytes'] / 2 ** 20:>9.1f} MB" if 'peak_traced_bytes' in measurement else '')
+              + (f" {measurement['payload_bytes'] / 1024:>10.1f} KB" if 'payload_bytes' in measurement else ''))
+        return result
+
+    def perform_analysis(frame):
+        result, status_code = app.perform_analysis({
+            "dataframe": frame,
+            "analysis_params": all_params,
+            "styling_params": "Default styling.",
+            "openai_response_text": "Benchmark.",
+        })
+        if status_code != 200:
+            raise RuntimeError(f"perform_analysis failed: {result.get('error')}")
+        return result
+
+    # Warm up on a few rows, so one-off costs (lazy imports, plotly templates) are not timed
+    perform_analysis(pd.read_csv(path, nrows=1000))
+
+    print(f"{'stage':<40} {'time':>13} {'peak mem':>12} {'payload':>13}")
+    raw = record('read_csv', lambda: pd.read_csv(path))
+    processed = record('process', lambda df: app.data_processing_agent.process(df), lambda: (raw.copy(),))
+    df = record('preprocess', lambda df: app.preprocessing_agent.preprocess(df), lambda: (processed.copy(),))
+
+    def analysis_payload(results):
+        return payload_bytes({key: value for key, value in results.items() if key != app.CLUSTER_LABELS_KEY})
+
+    for key in all_keys:
+        record(f'analyze.{key}', lambda: app.analysis_agent.analyze(df, {key: True}), payload=analysis_payload)
+    results = record('analyze', lambda: app.analysis_agent.analyze(df, all_params), payload=analysis_payload)
+    cluster_labels = results.pop(app.CLUSTER_LABELS_KEY, None)
+
+    record('visualize', lambda: app.visualization_agent.visualize(
+        df, results, 'Default styling.', cluster_labels=cluster_labels
+    ), payload=payload_bytes)
+
+    record('perform_analysis', perform_analysis, lambda: (raw.copy(),), payload=payload_bytes)
+
+    # A whole upload request; the stub stands in for the OpenAI call
+    app.interpret_query = lambda user_query, client=None: (dict(all_params), "Benchmark.")
+    client = app.app.test_client()
+    with open(path, 'rb') as source:
+        upload = source.read()
+
+    def request():
+        response = client.post('/', data={
+            'user_query': 'Run every analysis.',
+            'dataset': (io.BytesIO(upload), os.path.basename(path)),
+        }, content_type='multipart/form-data')
+        if response.status_code != 200:
+            raise RuntimeError(f"Upload request failed with status {response.status_code}")
+        return response.get_data()
+    record('request', request, payload=len)
+
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'dataset': {**params, 'csv_bytes': os.path.getsize(path), 'streamed': len(upload) > app.STREAMING_THRESHOLD},
+        'peak_rss_bytes': peak_rss_bytes(),
+        'stages': stages,
+    }
+
+
+def compare(results, baseline):
+    """
+    Print the time and memory of every stage relative to a baseline run.
+    """
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    if baseline.get('dataset') != results['dataset']:
+        print("  warning: the baseline ran on a different dataset")
+    print(f"{'stage':<40} {'time':>8} {'peak mem':>9} {'payload':>8}")
+    for name, stage in results['stages'].items():
+        old = baseline.get('stages', {}).get(name)
+        if old is None:
+            continue
+        ratios = []
+        for field in ('min_seconds', 'peak_traced_bytes', 'payload_bytes'):
+            if stage.get(field) and old.get(field):
+                ratios.append(f"{stage[field] / old[field]:.2f}x")
+            else:
+                ratios.append('-')
+        print(f"{name:<40} {ratios[0]:>8} {ratios[1]:>9} {ratios[2]:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmarks', 'data'),
+                        help='where generated CSVs are kept for later runs')
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/pipeline-<commit>.json)')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+    results = run(args)
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"pipeline-{results['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"\nResults written to {output}.")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            compare(results, json.load(handle))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare the result serialization layer with the recursive convert_to_native_types walk it replaced.
+
+Usage: python benchmarks/bench_serialization.py [--columns 500] [--categories 200000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import series_to_dict, frame_to_dict  # noqa: E402
+
+
+def legacy_convert(data):
+    """
+    The recursive walk previously used by AnalysisAgent.convert_to_native_types.
+    """
+    if isinstance(data, dict):
+        return {k: legacy_convert(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [legacy_convert(v) for v in data]
+    elif isinstance(data, (np.integer, np.floating, np.bool_)):
+        return data.item()
+    elif pd.isnull(data):
+        return None
+    else:
+        return data
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--columns', type=int, default=500, help='columns of the correlation matrix')
+    parser.add_argument('--categories', type=int, default=200_000, help='distinct values in the value counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    correlation = pd.DataFrame(np.corrcoef(rng.normal(size=(args.columns, 50))))
+    correlation.columns = correlation.index = [f'col_{i}' for i in range(args.columns)]
+    correlation.iloc[0, 1:] = np.nan
+    counts = pd.Series(rng.integers(1, 1000, args.categories), index=[f'value_{i}' for i in range(args.categories)])
+    monthly = pd.DataFrame(rng.normal(size=(240, 20)), index=pd.date_range('2000-01-31', periods=240, freq='ME'))
+
+    cases = [
+        (f'correlation matrix {args.columns}x{args.columns}',
+         lambda: legacy_convert(correlation.to_dict()), lambda: frame_to_dict(correlation)),
+        (f'value counts, {args.categories:,} categories',
+         lambda: legacy_convert(counts.to_dict()), lambda: series_to_dict(counts)),
+        ('monthly time series 240x20',
+         lambda: legacy_convert(monthly.to_dict()), lambda: frame_to_dict(monthly)),
+    ]
+
+    print(f"{'case':<40} {'legacy (ms)':>12} {'new (ms)':>10} {'speedup':>8}")
+    for name, legacy, new in cases:
+        legacy_time, legacy_result = best_of(args.repeat, legacy)
+        new_time, new_result = best_of(args.repeat, new)
+        assert legacy_result == new_result, f"Results differ for {name}"
+        print(f"{name:<40} {legacy_time * 1000:>12.1f} {new_time * 1000:>10.1f} {legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Measure how long a worker takes to start and to serve its first requests.
+
+Usage: python benchmarks/bench_startup.py [--rows 10000] [--repeat 5] [--output results.json]
+       [--baseline previous.json] [dataset options of datagen.py]
+
+Every run is a fresh Python process. "cold" imports the app and serves an upload request with
+every analysis, as a gunicorn worker without preload_app or warmup does. "preload" imports the
+app and runs app.preload() in a parent process, then forks a child that runs app.warmup() and
+serves the same requests, as the gunicorn master and its workers do with gunicorn.conf.py. The
+import and preload times are those of the parent and the warmup time that of the child; the
+request times are what a user waits for after a scale-up.
+
+interpret_query is stubbed out, and the result cache, dataset store and saved tables are kept in
+memory, so every request does the full analysis without touching the disk.
+"""
+import os
+import io
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import warnings
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+MODES = ('cold', 'preload')
+PHASES = ('import_seconds', 'preload_seconds', 'warmup_seconds', 'first_request_seconds', 'second_request_seconds')
+
+
+def serve(app, path, results):
+    """
+    Time two identical upload requests with every analysis; the second shows the steady state.
+    """
+    all_params = {key: True for key in app.VALID_ANALYSIS_KEYS}
+    app.interpret_query = lambda user_query, client=None: (dict(all_params), "Benchmark.")
+    client = app.app.test_client()
+    with open(path, 'rb') as source:
+        upload = source.read()
+    for phase in ('first_request_seconds', 'second_request_seconds'):
+        started = time.perf_counter()
+        response = client.post('/', data={
+            'user_query': 'Run every analysis.',
+            'dataset': (io.BytesIO(upload), os.path.basename(path)),
+        }, content_type='multipart/form-data')
+        results[phase] = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"Upload request failed with status {response.status_code}")
+    return results
+
+
+def child(mode, path):
+    """
+    One measurement in this (fresh) process; prints the results as JSON.
+    """
+    os.environ['RESULT_CACHE_BACKEND'] = 'none'
+    os.environ['ANALYSIS_TABLES_BACKEND'] = 'memory'
+    os.environ['DATASET_STORE_DIR'] = ''
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+
+    started = time.perf_counter()
+    import app
+    results = {'import_seconds': time.perf_counter() - started}
+    if mode == 'cold':
+        return serve(app, path, results)
+
+    results['preload_seconds'] = app.preload()
+    import gc
+    gc.freeze()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            with os.fdopen(write_fd, 'w') as pipe:
+                json.dump(serve(app, path, {'warmup_seconds': app.warmup()}), pipe)
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        output = pipe.read()
+    os.waitpid(pid, 0)
+    if not output:
+        raise RuntimeError("The forked worker failed")
+    results.update(json.loads(output))
+    return results
+
+
+def run(args):
+    from datagen import cached_csv, dataset_params
+    from bench_pipeline import git_commit
+
+    params = dataset_params(args)
+    path = cached_csv(args.data_dir, **params)
+    modes = {}
+    print(f"{'mode':<10}" + ''.join(f"{phase.replace('_seconds', ''):>16}" for phase in PHASES))
+    for mode in MODES:
+        runs = []
+        for _ in range(args.repeat):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, path],
+                cwd=os.path.dirname(ROOT), capture_output=True, text=True, check=True,
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        modes[mode] = {
+            phase: statistics.median(result[phase] for result in runs)
+            for phase in PHASES if all(phase in result for result in runs)
+        }
+        print(f"{mode:<10}" + ''.join(
+            f"{modes[mode][phase] * 1000:>13.1f} ms" if phase in modes[mode] else f"{'-':>16}" for phase in PHASES
+        ))
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'dataset': {**params, 'csv_bytes': os.path.getsize(path)},
+        'runs': args.repeat,
+        'modes': modes,
+    }
+
+
+def compare(results, baseline):
+    """
+    Print every phase relative to a baseline run.
+    """
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for mode, phases in results['modes'].items():
+        old = baseline.get('modes', {}).get(mode, {})
+        ratios = [f"{phases[phase] / old[phase]:.2f}x" if old.get(phase) and phase in phases else '-' for phase in PHASES]
+        print(f"{mode:<10}" + ''.join(f"{ratio:>16}" for ratio in ratios))
+
+
+def main():
+    if sys.argv[1:2] == ['--child']:
+        # The measured process imports nothing but the app (datagen would import pandas first)
+        mode, path = sys.argv[2:4]
+        print(json.dumps(child(mode, path)))
+        return
+
+    from datagen import add_arguments
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.set_defaults(rows=10_000)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh processes per mode')
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'data'),
+                        help='where generated CSVs are kept for later runs')
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/startup-<commit>.json)')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    results = run(args)
+    output = args.output or os.path.join(ROOT, 'results', f"startup-{results['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"\nResults written to {output}.")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            compare(results, json.load(handle))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Check query interpretation offline, with a stub in place of the OpenAI client.
+
+Usage: python benchmarks/check_intents.py
+
+Canned queries must be answered locally, without calling the client, and with the same structured
+output (a boolean for every analysis key and an explanation) as the LLM path gives for the same
+selection. Queries that negate, ask or say more than the names of analyses must reach the client.
+Neither path may import openai. Exits with status 1 on the first mismatch.
+"""
+import os
+import sys
+import json
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOCAL_QUERIES = {
+    "show correlations": {"correlation_matrix"},
+    "Summary statistics, please": {"descriptive_statistics"},
+    "describe the data": {"descriptive_statistics"},
+    "missing values and value counts": {"missing_values", "value_counts"},
+    "show me the trends over time": {"time_series_analysis"},
+    "run all analyses": {"descriptive_statistics", "correlation_matrix", "missing_values",
+                         "value_counts", "time_series_analysis", "clustering_analysis"},
+}
+LLM_QUERIES = [
+    "no clustering, just summary statistics",
+    "don't show missing values",
+    "why are sales missing in march?",
+    "how many empty seats per flight",
+    "is revenue related to unique visitors",
+    "correlations between price and rating",
+    "statistics except for the id column",
+]
+
+
+class StubChatCompletion:
+    """
+    Answers like the model would, selecting `selected`, and records the queries it was sent.
+    """
+    def __init__(self, selected=()):
+        self.selected = set(selected)
+        self.queries = []
+
+    def create(self, messages, **kwargs):
+        self.queries.append(messages[-1]["content"])
+        params = {key: key in self.selected for key in app.VALID_ANALYSIS_KEYS}
+        content = f"```json\n{json.dumps(params)}\n```\nThe platform will run the selected analyses."
+        return {"choices": [{"message": {"content": content}}]}
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL: {message}")
+        sys.exit(1)
+
+
+def main():
+    for query, expected in LOCAL_QUERIES.items():
+        stub = StubChatCompletion()
+        params, explanation = app.interpret_query(query, client=stub)
+        check(not stub.queries, f"{query!r} reached the LLM")
+        check({key for key, value in params.items() if value} == expected, f"{query!r} selected {params}")
+
+        llm_params, llm_explanation, _ = app._interpret_query_with_llm(query, StubChatCompletion(expected))
+        check(params == llm_params, f"{query!r}: local {params} != LLM {llm_params}")
+        check(type(explanation) is type(llm_explanation) and explanation, f"{query!r}: no explanation")
+        print(f"local  {query!r}: {explanation}")
+
+    for query in LLM_QUERIES:
+        stub = StubChatCompletion({"descriptive_statistics"})
+        app.interpret_query(query, client=stub)
+        check(stub.queries == [query], f"{query!r} was answered locally")
+        print(f"LLM    {query!r}")
+    check('openai' not in sys.modules, "openai was imported with a stub client")
+    print("OK")
+
+
+if __name__ == '__main__':
+    os.environ['RESULT_CACHE_BACKEND'] = 'none'
+    os.environ['ANALYSIS_TABLES_BACKEND'] = 'memory'
+    os.environ['DATASET_STORE_DIR'] = ''
+    logging.disable(logging.WARNING)
+    import app
+    main()
@@ -0,0 +1,79 @@
+"""
+Check that the chunked ingestion path gives the same results as reading the file whole.
+
+Usage: python benchmarks/check_streaming.py
+
+Each case is a small CSV read with a chunk size that puts a chunk boundary inside it: a text
+column whose later chunk holds only digits, and a blank line and a quoted line break in the first
+chunk. The value counts, descriptive statistics and missing values of perform_analysis on the
+chunks must equal those of the whole frame, up to floating point rounding. Exits with status 1 on
+the first mismatch.
+"""
+import io
+import os
+import sys
+import math
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNK_SIZE = 10
+ANALYSES = ("descriptive_statistics", "missing_values", "value_counts")
+
+CASES = {
+    # Text in the first chunk, digits only in the second (with distinct counts, so no ties)
+    "digits after text": "id,code,amount\n" + "".join(
+        f"{i},{code},{i * 1.5}\n" for i, code in enumerate(["A1"] * 6 + ["A2"] * 4 + ["7"] * 7 + ["8"] * 3)
+    ),
+    # Physical lines that are not records before the first chunk boundary
+    "blank line and quoted newline": "id,code,amount\n0,\"a\nb\",1.0\n\n" + "".join(
+        f"{i},c{i % 3},{i}\n" for i in range(1, 2 * CHUNK_SIZE + 3)
+    ),
+}
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL: {message}")
+        sys.exit(1)
+
+
+def same(a, b):
+    """
+    Equal results, with floats equal up to rounding and dict keys of the same type and order.
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        if list(a) != list(b) or any(type(x) is not type(y) for x, y in zip(a, b)):
+            return False
+        return all(same(a[key], b[key]) for key in a)
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9) or (math.isnan(a) and math.isnan(b))
+    return type(a) is type(b) and a == b
+
+
+def analyze(**data):
+    result, status_code = app.perform_analysis({
+        **data, "analysis_params": {key: key in ANALYSES for key in app.VALID_ANALYSIS_KEYS},
+    })
+    check(status_code == 200, f"analysis failed: {result.get('error')}")
+    return result["analysis"]
+
+
+def main():
+    for name, text in CASES.items():
+        whole = analyze(dataframe=app.pd.read_csv(io.StringIO(text)))
+        streamed = analyze(chunks=read_csv_chunks(io.StringIO(text), chunksize=CHUNK_SIZE))
+        for key in ANALYSES:
+            check(same(whole[key], streamed[key]), f"{name}: {key} differs\n  whole:    {whole[key]}\n  streamed: {streamed[key]}")
+        print(f"ok     {name}")
+    print("OK")
+
+
+if __name__ == '__main__':
+    os.environ['RESULT_CACHE_BACKEND'] = 'none'
+    os.environ['ANALYSIS_TABLES_BACKEND'] = 'memory'
+    os.environ['DATASET_STORE_DIR'] = ''
+    logging.disable(logging.WARNING)
+    import app
+    from ingestion import read_csv_chunks
+    main()
@@ -0,0 +1,116 @@
+"""
+Synthetic CSV datasets for the benchmarks.
+
+Usage: python benchmarks/datagen.py output.csv [--rows 100000] [--columns 12] [--categorical-ratio 0.25]
+       [--cardinality 50] [--null-ratio 0.05] [--date-columns 1] [--duplicate-ratio 0.01] [--seed 0]
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+DATE_RANGE = (pd.Timestamp('2020-01-01'), pd.Timestamp('2023-12-31'))
+
+
+def synthetic_frame(rows, columns=12, categorical_ratio=0.25, cardinality=50, null_ratio=0.05,
+                    date_columns=1, duplicate_ratio=0.0, seed=0):
+    """
+    A DataFrame of `rows` rows with `columns` value columns plus `date_columns` datetime columns.
+
+    A `categorical_ratio` share of the value columns are text with `cardinality` distinct values,
+    drawn with a skew so value counts have a head and a tail; the rest alternate between normal
+    floats and small integers. Every column has a `null_ratio` share of missing values, and a
+    `duplicate_ratio` share of the rows repeat earlier rows.
+    """
+    rng = np.random.default_rng(seed)
+    unique_rows = rows - int(rows * duplicate_ratio)
+    n_categorical = int(round(columns * categorical_ratio))
+    data = {}
+    for i in range(columns - n_categorical):
+        if i % 2 == 0:
+            data[f'num_{i}'] = rng.normal(100 * (i + 1), 10 * (i + 1), unique_rows).round(3)
+        else:
+            data[f'int_{i}'] = rng.integers(0, 1000, unique_rows).astype('float64')
+    # Zipf-like weights: the first values are far more frequent than the last
+    weights = 1 / np.arange(1, cardinality + 1)
+    weights /= weights.sum()
+    for i in range(n_categorical):
+        codes = rng.choice(cardinality, unique_rows, p=weights)
+        data[f'cat_{i}'] = np.array([f'c{i}_v{value}' for value in range(cardinality)], dtype=object)[codes]
+    start, end = (timestamp.value // 10 ** 9 for timestamp in DATE_RANGE)
+    for i in range(date_columns):
+        data[f'date_{i}'] = pd.to_datetime(rng.integers(start, end, unique_rows), unit='s')
+
+    df = pd.DataFrame(data)
+    if null_ratio > 0:
+        for col in df.columns:
+            df[col] = df[col].mask(rng.random(unique_rows) < null_ratio)
+    if unique_rows < rows:
+        repeated = df.iloc[rng.integers(0, unique_rows, rows - unique_rows)]
+        df = pd.concat([df, repeated], ignore_index=True).iloc[rng.permutation(rows)].reset_index(drop=True)
+    # Integer columns are written without a trailing ".0", as an export would
+    for col in df.columns:
+        if col.startswith('int_'):
+            df[col] = df[col].astype('Int64')
+    return df
+
+
+def write_csv(path, **params):
+    """
+    Write synthetic_frame(**params) to `path` and return the path.
+    """
+    synthetic_frame(**params).to_csv(path, index=False)
+    return path
+
+
+def cached_csv(directory, **params):
+    """
+    The path of the synthetic CSV for `params` in `directory`, generated on first use.
+    """
+    name = '-'.join(f"{key}={value}" for key, value in sorted(params.items())) + '.csv'
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_csv(path + '.tmp', **params)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def add_arguments(parser):
+    """
+    Add the dataset options shared by the benchmarks to an argparse parser.
+    """
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--columns', type=int, default=12, help='value columns, besides the date columns')
+    parser.add_argument('--categorical-ratio', type=float, default=0.25, help='share of text columns')
+    parser.add_argument('--cardinality', type=int, default=50, help='distinct values per text column')
+    parser.add_argument('--null-ratio', type=float, default=0.05)
+    parser.add_argument('--date-columns', type=int, default=1)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def dataset_params(args):
+    return {
+        'rows': args.rows,
+        'columns': args.columns,
+        'categorical_ratio': args.categorical_ratio,
+        'cardinality': args.cardinality,
+        'null_ratio': args.null_ratio,
+        'date_columns': args.date_columns,
+        'duplicate_ratio': args.duplicate_ratio,
+        'seed': args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output')
+    add_arguments(parser)
+    args = parser.parse_args()
+    write_csv(args.output, **dataset_params(args))
+    print(f"Wrote {args.rows:,} rows to {args.output} ({os.path.getsize(args.output) / 2 ** 20:.1f} MB).")
+
+
+if __name__ == '__main__':
+    main()
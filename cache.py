@@ -0,0 +1,177 @@
+import os
+import time
+import json
+import pickle
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when the shape of cached results changes so stale entries are never served
+CACHE_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream):
+    """
+    SHA-256 of a seekable binary stream, read in blocks. The stream is rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    """
+    Stable cache key from JSON-serializable parts (dicts are normalized by sorting keys).
+    """
+    payload = json.dumps([CACHE_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU cache bounded by entry count and by the total pickled size of its values.
+    Entries older than `ttl` seconds, when set, are treated as missing.
+    """
+    def __init__(self, max_entries=256, max_bytes=256 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored_at, payload)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            stored_at, payload = self.entries[key]
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return payload
+
+    def set(self, key, payload):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic(), payload)
+            self.total_bytes += len(payload)
+            while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, payload = self.entries.pop(key)
+        self.total_bytes -= len(payload)
+
+
+class DiskCacheBackend:
+    """
+    SQLite-backed LRU cache, shareable by every gunicorn worker on the host.
+    """
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute('SELECT payload FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+            return row[0]
+
+    def set(self, key, payload):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, payload, size, accessed) VALUES (?, ?, ?, ?)',
+                (key, sqlite3.Binary(payload), len(payload), time.time()),
+            )
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            while total > self.max_bytes:
+                oldest = conn.execute('SELECT key, size FROM entries ORDER BY accessed LIMIT 1').fetchone()
+                if oldest is None:
+                    break
+                conn.execute('DELETE FROM entries WHERE key = ?', (oldest[0],))
+                total -= oldest[1]
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+
+class ResultCache:
+    """
+    Pickling front end over a cache backend, with hit and miss counters.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        try:
+            payload = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Result cache read failed: {e}")
+            payload = None
+        with self.lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return pickle.loads(payload)
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.error(f"Result cache write failed: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+def create_result_cache(backend_name, directory='cache', max_mb=256, filename='results.sqlite3'):
+    """
+    Build the result cache named by `backend_name` ('memory', 'disk' or 'none'). The disk
+    backend keeps its entries in `filename` in `directory`.
+    """
+    max_bytes = max_mb * 1024 * 1024
+    if backend_name == 'none':
+        return None
+    if backend_name == 'disk':
+        return ResultCache(DiskCacheBackend(os.path.join(directory, filename), max_bytes=max_bytes))
+    if backend_name != 'memory':
+        logger.warning(f"Unknown result cache backend '{backend_name}'. Falling back to memory.")
+    return ResultCache(MemoryCacheBackend(max_bytes=max_bytes))
@@ -0,0 +1,31 @@
+import contextvars
+
+# Set while an analysis runs under run_cancellable(); the caller sets the event to stop it
+_cancel_event = contextvars.ContextVar('analysis_cancel_event', default=None)
+
+
+class AnalysisCancelled(Exception):
+    """
+    Raised inside an analysis that was cancelled, e.g. because it exceeded its timeout.
+    """
+
+
+def run_cancellable(event, task):
+    """
+    Run `task` so that check_cancelled() within it raises once `event` (a threading.Event) is
+    set. Call it in a copy of the context (contextvars.copy_context().run), as run_tasks does.
+    """
+    _cancel_event.set(event)
+    return task()
+
+
+def check_cancelled():
+    """
+    Raise AnalysisCancelled when the analysis running in this context was cancelled.
+
+    Python threads cannot be stopped from outside, so long loops call this between steps: a
+    cancelled analysis stops at its next check instead of running to the end in the background.
+    """
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise AnalysisCancelled()
@@ -0,0 +1,118 @@
+import numpy as np
+import logging
+from cancellation import check_cancelled
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ClusteringEngine:
+    """
+    Deterministic k-means clustering that scales with the number of rows.
+
+    Features are standardized, and when there are more than `max_features` of them they are
+    projected onto their first `max_features` principal components. Up to `minibatch_rows` rows
+    are clustered with full KMeans; larger inputs fit MiniBatchKMeans on a uniform sample of
+    `fit_sample_rows` rows and then assign every row to its nearest centre.
+
+    With `select_k=True` the number of clusters is chosen from `k_range` by the silhouette score
+    on a sample of `silhouette_sample_rows` rows; otherwise `n_clusters` is used. Every random
+    step uses `random_state`, so the same data always gets the same labels.
+    """
+    def __init__(self, n_clusters=3, select_k=False, k_range=(2, 8), max_features=20,
+                 minibatch_rows=50_000, fit_sample_rows=100_000, silhouette_sample_rows=3_000,
+                 random_state=0):
+        self.n_clusters = n_clusters
+        self.select_k = select_k
+        self.k_range = k_range
+        self.max_features = max_features
+        self.minibatch_rows = minibatch_rows
+        self.fit_sample_rows = fit_sample_rows
+        self.silhouette_sample_rows = silhouette_sample_rows
+        self.random_state = random_state
+
+    def settings(self):
+        """
+        The parameters that determine the labels, for cache keys.
+        """
+        return {
+            "n_clusters": self.n_clusters,
+            "select_k": self.select_k,
+            "k_range": list(self.k_range),
+            "max_features": self.max_features,
+            "minibatch_rows": self.minibatch_rows,
+            "fit_sample_rows": self.fit_sample_rows,
+            "silhouette_sample_rows": self.silhouette_sample_rows,
+            "random_state": self.random_state,
+        }
+
+    @staticmethod
+    def preload():
+        """
+        Import the scikit-learn estimators ahead of the first clustering.
+        """
+        import sklearn.cluster  # noqa: F401
+        import sklearn.decomposition  # noqa: F401
+        import sklearn.metrics  # noqa: F401
+        import sklearn.preprocessing  # noqa: F401
+
+    def fit_predict(self, numeric_df):
+        """
+        Cluster the rows of a numeric DataFrame without missing values.
+
+        Returns:
+            np.ndarray: The cluster label of every row.
+        """
+        features = self._features(numeric_df)
+        check_cancelled()
+        n_clusters = min(self.n_clusters, len(features))
+        if self.select_k:
+            n_clusters = self._select_k(features)
+        check_cancelled()
+        model = self._fit(features, n_clusters)
+        logger.info(f"Clustered {len(features)} rows into {n_clusters} clusters "
+                    f"on {features.shape[1]} features with {type(model).__name__}.")
+        return model.predict(features)
+
+    def _features(self, numeric_df):
+        from sklearn.decomposition import PCA
+        from sklearn.preprocessing import StandardScaler
+        features = StandardScaler().fit_transform(numeric_df.to_numpy(dtype='float64'))
+        if features.shape[1] > self.max_features:
+            check_cancelled()
+            pca = PCA(n_components=self.max_features, svd_solver='randomized', random_state=self.random_state)
+            pca.fit(self._sample(features, self.fit_sample_rows))
+            check_cancelled()
+            features = pca.transform(features)
+        return features
+
+    def _sample(self, features, rows):
+        if len(features) <= rows:
+            return features
+        rng = np.random.default_rng(self.random_state)
+        return features[np.sort(rng.choice(len(features), rows, replace=False))]
+
+    def _fit(self, features, n_clusters):
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+        if len(features) <= self.minibatch_rows:
+            return KMeans(n_clusters=n_clusters, n_init=10, random_state=self.random_state).fit(features)
+        model = MiniBatchKMeans(n_clusters=n_clusters, n_init=3, batch_size=4096, random_state=self.random_state)
+        return model.fit(self._sample(features, self.fit_sample_rows))
+
+    def _select_k(self, features):
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.metrics import silhouette_score
+        sample = self._sample(features, self.silhouette_sample_rows)
+        low, high = self.k_range
+        scores = {}
+        for k in range(max(2, low), min(high, len(sample) - 1) + 1):
+            check_cancelled()
+            labels = MiniBatchKMeans(n_clusters=k, n_init=3, batch_size=4096, random_state=self.random_state).fit_predict(sample)
+            if len(np.unique(labels)) > 1:
+                scores[k] = silhouette_score(sample, labels)
+        if not scores:
+            return min(self.n_clusters, len(features))
+        best = max(scores, key=scores.get)
+        logger.info(f"Selected {best} clusters by silhouette score ({scores[best]:.3f}).")
+        return best
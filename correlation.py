@@ -0,0 +1,169 @@
+import numpy as np
+import logging
+from cancellation import check_cancelled
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CorrelationEngine:
+    """
+    Pearson correlations of wide data as a sparse list of its most strongly correlated pairs.
+
+    Above `wide_columns` numeric columns (None never, 0 always) the dense correlation matrix is
+    replaced with the `top_k` pairs of largest absolute correlation or, with a `threshold`, the
+    pairs at or above it (the strongest `max_pairs` of them). Columns are standardized to
+    float32 and the correlations computed `block_columns` columns at a time as matrix products
+    over row batches, so memory stays near `max_mb` plus the pairs kept, whatever the number of
+    columns. The standardized data is kept whole when it fits in `max_mb`, and rebuilt batch by
+    batch otherwise.
+
+    Missing values count as the column mean, as preprocessing fills them; columns without
+    variance have no correlation and are left out.
+    """
+    def __init__(self, wide_columns=200, top_k=100, threshold=None, max_pairs=10_000,
+                 block_columns=256, max_mb=256):
+        self.wide_columns = wide_columns
+        self.top_k = top_k
+        self.threshold = threshold
+        self.max_pairs = max_pairs
+        self.block_columns = block_columns
+        self.max_mb = max_mb
+
+    def settings(self):
+        """
+        The parameters that determine the results, for cache keys.
+        """
+        return {
+            "wide_columns": self.wide_columns,
+            "top_k": self.top_k,
+            "threshold": self.threshold,
+            "max_pairs": self.max_pairs,
+        }
+
+    def is_wide(self, n_columns):
+        """
+        Whether `n_columns` numeric columns get the pair list rather than the dense matrix.
+        """
+        return self.wide_columns is not None and n_columns > self.wide_columns
+
+    def analyze(self, numeric_df):
+        """
+        The correlation result for a frame of numeric columns: {"pairs": [{"column_a",
+        "column_b", "correlation"}, ...] strongest first, "columns": columns compared, "rows":
+        rows used, "constant_columns", "top_k", "threshold"}.
+        """
+        columns = numeric_df.columns.tolist()
+        values = [_column_values(numeric_df[col]) for col in columns]
+        n_rows = len(numeric_df)
+        means, scales = self._moments(values, n_rows)
+        varying = np.flatnonzero(scales > 0)
+        limit = max(1, self.max_pairs if self.threshold is not None else self.top_k)
+        best = self._strongest_pairs([values[i] for i in varying], means[varying], scales[varying], n_rows, limit)
+        pairs = [
+            {"column_a": columns[varying[i]], "column_b": columns[varying[j]], "correlation": round(float(r), 6)}
+            for i, j, r in zip(*best)
+        ]
+        logger.info(f"Correlated {len(varying)} columns block by block; kept {len(pairs)} pairs.")
+        return {
+            "pairs": pairs,
+            "columns": int(len(varying)),
+            "rows": n_rows,
+            "constant_columns": len(columns) - int(len(varying)),
+            "top_k": None if self.threshold is not None else self.top_k,
+            "threshold": self.threshold,
+        }
+
+    @staticmethod
+    def _moments(values, n_rows):
+        # The standardized column is (x - mean) / sqrt(M2 / (n - 1)), with gaps at the mean, so the
+        # dot product of two standardized columns over n - 1 is their Pearson correlation
+        means = np.zeros(len(values))
+        scales = np.zeros(len(values))
+        for i, column in enumerate(values):
+            present = ~np.isnan(column)
+            if n_rows < 2 or not present.any():
+                continue
+            column = column[present].astype('float64', copy=False)
+            means[i] = column.mean()
+            m2 = np.square(column - means[i]).sum()
+            if m2 > 0:
+                scales[i] = np.sqrt((n_rows - 1) / m2)
+        return means, scales
+
+    def _strongest_pairs(self, values, means, scales, n_rows, limit):
+        n_columns = len(values)
+        block = max(1, self.block_columns)
+        max_bytes = self.max_mb * 1024 * 1024
+        if n_rows * n_columns * 4 <= max_bytes:
+            whole = _standardize(values, means, scales, np.arange(n_columns), slice(None))
+            batches = [slice(None)]
+            load = lambda cols, rows: whole[:, cols[0]:cols[-1] + 1]  # noqa: E731
+        else:
+            # Two blocks of a batch are held at a time
+            batch_rows = max(1, max_bytes // (2 * block * 4))
+            batches = [slice(start, start + batch_rows) for start in range(0, n_rows, batch_rows)]
+            load = lambda cols, rows: _standardize(values, means, scales, cols, rows)  # noqa: E731
+
+        kept_i, kept_j, kept_r = np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+        for left in range(0, n_columns, block):
+            left_cols = np.arange(left, min(left + block, n_columns))
+            for right in range(left, n_columns, block):
+                right_cols = np.arange(right, min(right + block, n_columns))
+                products = np.zeros((len(left_cols), len(right_cols)), dtype=np.float32)
+                for rows in batches:
+                    check_cancelled()
+                    left_block = load(left_cols, rows)
+                    right_block = left_block if right == left else load(right_cols, rows)
+                    products += left_block.T @ right_block
+                correlation = np.clip(products / np.float32(max(n_rows - 1, 1)), -1, 1)
+                strength = np.abs(correlation)
+                if right == left:
+                    # Each pair once: the strict upper triangle of a diagonal block
+                    strength[np.tril_indices(len(left_cols), k=0, m=len(right_cols))] = -1
+                candidates = np.flatnonzero(strength >= (self.threshold if self.threshold is not None else 0))
+                if len(candidates) > limit:
+                    candidates = candidates[np.argpartition(-strength.ravel()[candidates], limit - 1)[:limit]]
+                rows_at, cols_at = np.unravel_index(candidates, strength.shape)
+                kept_i = np.concatenate([kept_i, left_cols[rows_at]])
+                kept_j = np.concatenate([kept_j, right_cols[cols_at]])
+                kept_r = np.concatenate([kept_r, correlation[rows_at, cols_at]])
+                if len(kept_r) > 2 * limit:
+                    kept_i, kept_j, kept_r = _strongest(kept_i, kept_j, kept_r, limit)
+        return _strongest(kept_i, kept_j, kept_r, limit)
+
+
+def _column_values(series):
+    # NumPy columns are used as they are, converted a batch at a time; extension arrays once
+    if isinstance(series.dtype, np.dtype):
+        return series.to_numpy()
+    return series.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _standardize(values, means, scales, cols, rows):
+    """
+    The standardized float32 values of columns `cols` in the row slice `rows`, gaps as 0.
+    """
+    first = values[cols[0]][rows] if len(cols) else np.empty(0)
+    block = np.empty((len(first), len(cols)), dtype=np.float32, order='F')
+    for k, col in enumerate(cols):
+        # Centred in float64 first, so large values with a small spread keep their precision
+        standardized = (values[col][rows] - means[col]) * scales[col]
+        standardized[np.isnan(standardized)] = 0.0
+        block[:, k] = standardized
+    return block
+
+
+def _strongest(kept_i, kept_j, kept_r, limit):
+    order = np.argsort(-np.abs(kept_r), kind='stable')[:limit]
+    return kept_i[order], kept_j[order], kept_r[order]
+
+
+def correlation_pairs(correlation):
+    """
+    The pair list of a wide correlation result, or None for a dense correlation matrix.
+    """
+    if isinstance(correlation, dict) and isinstance(correlation.get("pairs"), list):
+        return correlation["pairs"]
+    return None
@@ -0,0 +1,440 @@
+import os
+import re
+import json
+import uuid
+import pickle
+import hashlib
+import logging
+import threading
+import contextlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from dedup import RowHashIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of stored datasets changes so stale files are rebuilt
+STORE_VERSION = 2
+METADATA_KEY = b'dataset_store'
+DATASET_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+PART_PATTERN = re.compile(r'^([0-9a-f]{64})\.(\d{6})\.arrow$')
+
+
+class DatasetStore:
+    """
+    Processed datasets kept on disk as uncompressed Arrow IPC files, one per dataset id.
+
+    Files are memory-mapped when read, so loading a subset of columns only touches the pages of
+    those columns, and numeric and datetime columns without gaps come back as zero-copy, read-only
+    views of the mapped file. The store is bounded by `max_bytes`; the least recently read
+    datasets are removed first.
+
+    Rows appended to a dataset are written as numbered part files next to it (`<id>.000001.arrow`
+    and so on), so an append never rewrites earlier rows. Each part has a sorted run of the
+    fingerprints of its raw rows (`.rows.npy`), which together form the row index appends are
+    deduplicated against, and each append gives the dataset a new revision. Running analysis
+    aggregates can be saved with the dataset (`<id>.state.pkl`) and are only loaded back for
+    the revision they were saved at.
+    """
+    def __init__(self, directory, max_bytes=2 * 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # One lock per dataset id, so appends to different datasets run concurrently; _lock only
+        # guards the lookup. Entries are small and kept for the life of the store.
+        self._locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, dataset_id, suffix='arrow'):
+        if not DATASET_ID_PATTERN.match(dataset_id or ''):
+            raise ValueError(f"Invalid dataset id: {dataset_id!r}")
+        return os.path.join(self.directory, f"{dataset_id}.{suffix}")
+
+    def _open(self, dataset_id):
+        return self._open_path(self._path(dataset_id))
+
+    @staticmethod
+    def _open_path(path):
+        return pa.ipc.open_file(pa.memory_map(path, 'r'))
+
+    def _parts(self, dataset_id):
+        """
+        Sequence numbers of the appended parts of a dataset, in order.
+        """
+        self._path(dataset_id)
+        return sorted(
+            int(match.group(2)) for match in map(PART_PATTERN.match, os.listdir(self.directory))
+            if match and match.group(1) == dataset_id
+        )
+
+    def _part_paths(self, dataset_id):
+        return [self._path(dataset_id)] + [self._path(dataset_id, f"{seq:06d}.arrow") for seq in self._parts(dataset_id)]
+
+    def metadata(self, dataset_id):
+        """
+        The metadata stored with a dataset, or None when the dataset is not in the store.
+        """
+        try:
+            schema = self._open(dataset_id).schema
+        except (FileNotFoundError, ValueError, pa.ArrowInvalid):
+            return None
+        metadata = json.loads((schema.metadata or {}).get(METADATA_KEY, b'{}'))
+        if metadata.get('version') != STORE_VERSION:
+            return None
+        return metadata
+
+    def contains(self, dataset_id, settings=None):
+        """
+        Whether the dataset is stored as uploaded, without appended rows, and was stored with
+        the same processing `settings`.
+        """
+        metadata = self.metadata(dataset_id)
+        return metadata is not None and metadata.get('settings') == settings and not self._parts(dataset_id)
+
+    def dtypes(self, dataset_id):
+        """
+        The pandas dtypes of the stored columns, read from the file schema only.
+        """
+        return self._open(dataset_id).schema.empty_table().to_pandas().dtypes
+
+    def revision(self, dataset_id):
+        """
+        Identifies the current rows of a dataset: the dataset id until rows are appended, then a
+        hash of the id and every appended upload.
+        """
+        parts = self._part_paths(dataset_id)
+        if len(parts) == 1:
+            return dataset_id
+        return self._part_metadata(parts[-1])['revision']
+
+    def put(self, dataset_id, df, settings=None, streamed=False, row_index=None):
+        """
+        Store a processed DataFrame under `dataset_id`, replacing any earlier version.
+        `row_index` is the RowHashIndex its raw rows were deduplicated with; its new
+        fingerprints become the row index appended rows are checked against.
+        """
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        schema = self._with_metadata(table.schema, settings, streamed)
+        self._write(dataset_id, schema, [table.cast(schema)], row_index)
+
+    def write_chunks(self, dataset_id, chunks, settings=None, streamed=True, row_index=None):
+        """
+        Pass processed `chunks` through unchanged while writing them to the store, one record
+        batch per chunk. The dataset is committed only once every chunk has been written, with
+        the new fingerprints of `row_index` (a RowHashIndex filled while the chunks were
+        deduplicated) as its row index.
+
+        Chunk dtypes of a numeric column can differ (an integer chunk followed by one with gaps),
+        so integer columns are stored as float64, which is how the analyses read them anyway.
+        A chunk that still does not fit the schema of the first one leaves the dataset unstored.
+        """
+        path = self._path(dataset_id)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        writer = schema = None
+        try:
+            for chunk in chunks:
+                if temp_path is not None:
+                    try:
+                        table = pa.Table.from_pandas(chunk, preserve_index=False)
+                        if writer is None:
+                            fields = [
+                                pa.field(field.name, pa.float64()) if pa.types.is_integer(field.type) else field
+                                for field in table.schema
+                            ]
+                            schema = self._with_metadata(pa.schema(fields, table.schema.metadata), settings, streamed)
+                            writer = pa.ipc.new_file(temp_path, schema)
+                        writer.write_table(table.cast(schema))
+                    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+                        logger.warning(f"Dataset {dataset_id} not stored: {e}")
+                        writer = self._discard(writer, temp_path)
+                        temp_path = None
+                yield chunk
+            if writer is not None:
+                writer.close()
+                writer = None
+                self._commit(dataset_id, temp_path, row_index)
+        finally:
+            self._discard(writer, temp_path)
+
+    def append_chunks(self, dataset_id, chunks, row_index, upload_hash):
+        """
+        Pass processed `chunks` of rows appended to a stored dataset through unchanged while
+        writing them to a new part of the dataset. The part is committed once every chunk has
+        been written, with the new fingerprints of `row_index` as its row index and a revision
+        derived from the current one and `upload_hash`. Nothing is written when every chunk is
+        empty. Hold lock(dataset_id) while appending.
+
+        Chunks are cast to the schema of the dataset; one that does not fit (an integer column
+        that now has gaps) keeps its own schema, and load() and iter_chunks() reconcile the types.
+        """
+        base_schema = self._open(dataset_id).schema
+        parts = self._parts(dataset_id)
+        seq = parts[-1] + 1 if parts else 1
+        path = self._path(dataset_id, f"{seq:06d}.arrow")
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        revision = hashlib.sha256(f"{self.revision(dataset_id)}:{upload_hash}".encode('utf-8')).hexdigest()
+        writer = schema = None
+        try:
+            for chunk in chunks:
+                if len(chunk) > 0:
+                    table = pa.Table.from_pandas(chunk[list(base_schema.names)], preserve_index=False)
+                    if writer is None:
+                        try:
+                            table.cast(base_schema)
+                            schema = base_schema
+                        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                            schema = table.schema
+                        metadata = {'version': STORE_VERSION, 'revision': revision}
+                        schema = schema.with_metadata({**(schema.metadata or {}), METADATA_KEY: json.dumps(metadata)})
+                        writer = pa.ipc.new_file(temp_path, schema)
+                    writer.write_table(table.cast(schema))
+                yield chunk
+            if writer is not None:
+                writer.close()
+                writer = None
+                os.replace(temp_path, path)
+                self._save_row_index(self._path(dataset_id, f"{seq:06d}.rows.npy"), row_index)
+                logger.info(f"Appended part {seq} to dataset {dataset_id}.")
+                self._touch(dataset_id)
+                self._evict()
+        finally:
+            self._discard(writer, temp_path)
+
+    def row_index(self, dataset_id):
+        """
+        A RowHashIndex over the fingerprints of every stored row of the dataset, memory-mapped.
+        """
+        runs = []
+        for path in self._part_paths(dataset_id):
+            rows_path = f"{path[:-len('.arrow')]}.rows.npy"
+            try:
+                runs.append(np.load(rows_path, mmap_mode='r'))
+            except FileNotFoundError:
+                logger.warning(f"No row index at {rows_path}; appended rows are not checked against that part.")
+        return RowHashIndex(runs)
+
+    def load(self, dataset_id, columns=None):
+        """
+        Read the dataset, or only `columns` of it, as a DataFrame.
+        """
+        tables = []
+        for path in self._part_paths(dataset_id):
+            table = self._open_path(path).read_all()
+            tables.append(table.select(list(columns)) if columns is not None else table)
+        self._touch(dataset_id)
+        if len(tables) == 1:
+            return tables[0].to_pandas(split_blocks=True)
+        base = tables[0].schema
+        if all(table.schema.equals(base, check_metadata=False) for table in tables):
+            tables = [table.replace_schema_metadata(base.metadata) for table in tables]
+            return pa.concat_tables(tables).to_pandas(split_blocks=True)
+        return pd.concat([table.to_pandas(split_blocks=True) for table in tables], ignore_index=True)
+
+    def iter_chunks(self, dataset_id, columns=None):
+        """
+        Read the dataset, or only `columns` of it, one stored record batch at a time.
+        """
+        paths = self._part_paths(dataset_id)
+        self._touch(dataset_id)
+        for path in paths:
+            reader = self._open_path(path)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(list(columns))
+                yield batch.to_pandas(split_blocks=True)
+
+    def save_state(self, dataset_id, state, settings=None):
+        """
+        Save analysis aggregates for the current revision of a dataset.
+        """
+        payload = {'revision': self.revision(dataset_id), 'settings': settings, 'state': state}
+        path = self._path(dataset_id, 'state.pkl')
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'wb') as handle:
+                pickle.dump(payload, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        finally:
+            self._discard(None, temp_path)
+
+    def load_state(self, dataset_id, settings=None):
+        """
+        The analysis aggregates saved for the current revision of a dataset with the same
+        `settings`, or None.
+        """
+        try:
+            with open(self._path(dataset_id, 'state.pkl'), 'rb') as handle:
+                payload = pickle.load(handle)
+        except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+            return None
+        if payload['revision'] != self.revision(dataset_id) or payload['settings'] != settings:
+            return None
+        return payload['state']
+
+    @contextlib.contextmanager
+    def lock(self, dataset_id):
+        """
+        Serialize appends to a dataset, across threads and, where flock is available, processes.
+        Appends to other datasets are not blocked.
+        """
+        path = self._path(dataset_id, 'lock')
+        with self._lock:
+            dataset_lock = self._locks.setdefault(dataset_id, threading.Lock())
+        with dataset_lock:
+            if fcntl is None:
+                yield
+                return
+            while True:
+                handle = open(path, 'a')
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                # The lock file is removed with its dataset (see delete): if that happened while
+                # we waited, we hold a lock nobody else sees, so lock the new file instead
+                try:
+                    if os.path.samestat(os.fstat(handle.fileno()), os.stat(path)):
+                        break
+                except FileNotFoundError:
+                    pass
+                handle.close()
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+
+    def delete(self, dataset_id):
+        """
+        Remove a dataset with its appended parts, row index, saved state and lock file, unless
+        an append holds its lock.
+
+        Returns:
+            bool: Whether the dataset was removed.
+        """
+        path = self._path(dataset_id, 'lock')
+        if fcntl is None:
+            self._delete_files(dataset_id, keep_base=False)
+            return True
+        with open(path, 'a') as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                if not os.path.samestat(os.fstat(handle.fileno()), os.stat(path)):
+                    return False  # Deleted by another worker meanwhile
+                self._delete_files(dataset_id, keep_base=False)
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        return True
+
+    def _delete_files(self, dataset_id, keep_base):
+        self._path(dataset_id)
+        for name in os.listdir(self.directory):
+            if not name.startswith(f"{dataset_id}.") or name.endswith(('.tmp', '.lock')):
+                continue
+            if keep_base and name == f"{dataset_id}.arrow":
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _with_metadata(schema, settings, streamed):
+        metadata = {'version': STORE_VERSION, 'settings': settings, 'streamed': streamed}
+        return schema.with_metadata({**(schema.metadata or {}), METADATA_KEY: json.dumps(metadata)})
+
+    def _part_metadata(self, path):
+        return json.loads(self._open_path(path).schema.metadata[METADATA_KEY])
+
+    def _write(self, dataset_id, schema, tables, row_index=None):
+        path = self._path(dataset_id)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with pa.ipc.new_file(temp_path, schema) as writer:
+                for table in tables:
+                    writer.write_table(table)
+            self._commit(dataset_id, temp_path, row_index)
+        finally:
+            self._discard(None, temp_path)
+
+    def _commit(self, dataset_id, temp_path, row_index):
+        # A new upload replaces the dataset, so earlier appended parts and saved state go with it
+        self._delete_files(dataset_id, keep_base=True)
+        os.replace(temp_path, self._path(dataset_id))
+        if row_index is not None:
+            self._save_row_index(self._path(dataset_id, 'rows.npy'), row_index)
+        logger.info(f"Stored dataset {dataset_id}.")
+        self._evict()
+
+    def _save_row_index(self, path, row_index):
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            row_index.save_new(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            self._discard(None, temp_path)
+
+    @staticmethod
+    def _discard(writer, temp_path):
+        if writer is not None:
+            writer.close()
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
+    def _touch(self, dataset_id):
+        try:
+            os.utime(self._path(dataset_id))
+        except OSError:
+            pass
+
+    def _evict(self):
+        # A dataset is evicted as a whole: its parts, row index, state and lock file go with it
+        datasets = {}
+        locks = set()
+        for name in os.listdir(self.directory):
+            dataset_id = name[:64]
+            if not DATASET_ID_PATTERN.match(dataset_id) or name.endswith('.tmp'):
+                continue
+            if name.endswith('.lock'):
+                locks.add(dataset_id)
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue  # Removed by another worker since listdir
+            mtime, size = datasets.get(dataset_id, (0, 0))
+            last_read = stat.st_mtime if name == f"{dataset_id}.arrow" else 0
+            datasets[dataset_id] = (max(mtime, last_read), size + stat.st_size)
+        # Lock files left without their dataset
+        for dataset_id in locks - set(datasets):
+            self.delete(dataset_id)
+        total = sum(size for _, size in datasets.values())
+        for dataset_id, (_, size) in sorted(datasets.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            if not self.delete(dataset_id):
+                continue  # Being appended to
+            total -= size
+            logger.info(f"Evicted dataset {dataset_id} from the dataset store.")
+
+
+def create_dataset_store(directory, max_mb=2048):
+    """
+    Build the dataset store in `directory`, or return None when `directory` is empty.
+    """
+    if not directory:
+        return None
+    return DatasetStore(directory, max_bytes=max_mb * 1024 * 1024)
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def stratified_sample(df, strata, budget, random_state=0):
+    """
+    Sample at most `budget` rows of `df`, allocated to each stratum in proportion to its size,
+    but with at least min(size, budget // number of strata) rows per stratum so small strata
+    (small clusters) stay visible.
+
+    Args:
+        df (pd.DataFrame): The rows to sample.
+        strata (array-like): The stratum of each row, in row order.
+        budget (int): Maximum number of rows to keep.
+
+    Returns:
+        pd.DataFrame: The sampled rows, in their original order.
+    """
+    if len(df) <= budget:
+        return df
+    strata = np.asarray(strata)
+    labels, inverse, sizes = np.unique(strata, return_inverse=True, return_counts=True)
+    floor = np.minimum(sizes, budget // len(labels))
+    remaining = budget - floor.sum()
+    extra = np.floor((sizes - floor) / max((sizes - floor).sum(), 1) * remaining).astype('int64')
+    quotas = floor + extra
+
+    # A uniform random key per row; each stratum keeps its rows with the smallest keys
+    keys = np.random.default_rng(random_state).random(len(df))
+    order = np.lexsort((keys, inverse))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.empty(len(df), dtype='int64')
+    rank[order] = np.arange(len(df)) - np.repeat(starts, sizes)
+    return df[rank < quotas[inverse]]
+
+
+def uniform_sample(df, budget, random_state=0):
+    """
+    Uniform sample of at most `budget` rows of `df`, in their original order.
+    """
+    if len(df) <= budget:
+        return df
+    rng = np.random.default_rng(random_state)
+    return df.iloc[np.sort(rng.choice(len(df), budget, replace=False))]
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line to `threshold` points. Keeps the first
+    and last points and, from each bucket in between, the point forming the largest triangle with
+    the point kept from the previous bucket and the mean of the next bucket, which preserves the
+    visual shape of the series far better than decimation.
+
+    Args:
+        x (array-like): Increasing numeric x values (convert datetimes to integers first).
+        y (array-like): The y values.
+        threshold (int): Number of points to keep (at least 3).
+
+    Returns:
+        np.ndarray: Indices of the kept points, increasing.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype('int64')
+    kept = np.empty(threshold, dtype='int64')
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.nanargmax(areas)) if not np.isnan(areas).all() else start
+        kept[bucket + 1] = previous
+    return kept
+
+
+def minmax_buckets(y, buckets):
+    """
+    Keep the minimum and maximum of each of `buckets` equal-width index ranges, so spikes survive
+    downsampling. Cheaper than LTTB for very long series.
+
+    Returns:
+        np.ndarray: Indices of the kept points, increasing.
+    """
+    y = np.asarray(y, dtype='float64')
+    if 2 * buckets >= len(y):
+        return np.arange(len(y))
+    edges = np.linspace(0, len(y), buckets + 1).astype('int64')
+    filled = np.where(np.isnan(y), np.nanmean(y), y)
+    lows = [start + int(np.argmin(filled[start:end])) for start, end in zip(edges[:-1], edges[1:])]
+    highs = [start + int(np.argmax(filled[start:end])) for start, end in zip(edges[:-1], edges[1:])]
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def density_grid(x, y, bins=100):
+    """
+    2D histogram of the points (x, y), ignoring points with a missing coordinate.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Bin centres along x and y, and the counts
+        with one row per y bin, the layout plotly heatmaps expect.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    valid = ~(np.isnan(x) | np.isnan(y))
+    counts, x_edges, y_edges = np.histogram2d(x[valid], y[valid], bins=bins)
+    return (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, counts.T
+
+
+def downsample_series(dates, values, budget):
+    """
+    Reduce a time series to at most `budget` points with LTTB, or with min/max bucketing when
+    the series is more than a hundred times longer than the budget.
+
+    Returns:
+        Tuple[list, list]: The kept dates and values.
+    """
+    if len(dates) <= budget:
+        return list(dates), list(values)
+    x = pd.to_datetime(pd.Index(dates)).asi8 if not np.issubdtype(np.asarray(dates).dtype, np.number) else dates
+    if len(dates) > 100 * budget:
+        kept = minmax_buckets(values, budget // 2)
+    else:
+        kept = lttb(x, values, budget)
+    logger.info(f"Downsampled time series from {len(dates)} to {len(kept)} points.")
+    return [dates[i] for i in kept], [values[i] for i in kept]
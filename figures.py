@@ -0,0 +1,86 @@
+import json
+import time
+import base64
+import logging
+import datetime
+import numpy as np
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Numeric array types plotly.js can read as typed arrays, by numpy dtype
+TYPED_ARRAY_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8',
+}
+# Arrays shorter than this stay JSON lists; the base64 wrapper is not worth it
+MIN_TYPED_ARRAY_LENGTH = 16
+
+
+def encode_figure(fig, binary=True):
+    """
+    Serialize a plotly figure to JSON for the analysis page.
+
+    With `binary=True`, numeric arrays are written as base64 typed arrays in the plotly.js
+    convention, {"dtype": "f8", "bdata": "...", "shape": "rows, cols"}, which the page decodes
+    into typed arrays before plotting. That is smaller and much faster to encode and parse than
+    JSON number lists. Otherwise the output is the same as fig.to_json().
+    """
+    started = time.perf_counter()
+    if binary:
+        payload = json.dumps(_encode_arrays(fig.to_plotly_json()), cls=PlotlyJSONEncoder, separators=(',', ':'))
+    else:
+        payload = fig.to_json()
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"Encoded figure ({'binary' if binary else 'json'}): {len(payload):,} bytes in {elapsed:.1f} ms.")
+    return payload
+
+
+def _encode_arrays(value):
+    if isinstance(value, dict):
+        return {key: _encode_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) >= MIN_TYPED_ARRAY_LENGTH and all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in value):
+            return _typed_array(np.asarray(value)) or value
+        return [_encode_arrays(item) for item in value]
+    if isinstance(value, np.ndarray):
+        if value.dtype == object and value.size and isinstance(value.flat[0], datetime.datetime) \
+                and value.flat[0].tzinfo is None:
+            # Format naive timestamps in one vectorized call instead of one isoformat() per value
+            stamps = pd.DatetimeIndex(value.ravel()).to_numpy()
+            unit = 's' if (stamps.view('int64') % 1_000_000_000 == 0).all() else 'us'
+            return np.datetime_as_string(stamps, unit=unit).tolist()
+        return _typed_array(value) or value
+    return value
+
+
+def _compact(array):
+    # Whole numbers (counts, labels, ids) ship as the smallest integer type that holds them;
+    # plotly.js has no 64-bit integer arrays
+    if array.dtype.kind not in 'iuf' or array.size == 0:
+        return array
+    if array.dtype.kind == 'f' and not (np.isfinite(array).all() and (array == np.round(array)).all()):
+        return array
+    low, high = array.min(), array.max()
+    for dtype in ('uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32'):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return array.astype(dtype)
+    return array.astype('float64')
+
+
+def _typed_array(array):
+    if array.size < MIN_TYPED_ARRAY_LENGTH or array.ndim > 2:
+        return None
+    array = _compact(array)
+    dtype = TYPED_ARRAY_DTYPES.get(array.dtype.name)
+    if dtype is None:
+        return None
+    data = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<')).tobytes()
+    encoded = {'dtype': dtype, 'bdata': base64.b64encode(data).decode('ascii')}
+    if array.ndim == 2:
+        encoded['shape'] = f"{array.shape[0]}, {array.shape[1]}"
+    return encoded
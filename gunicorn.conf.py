@@ -0,0 +1,40 @@
+"""
+Gunicorn settings, read from the working directory by `gunicorn app:app` (see the Procfile).
+
+By default the app is imported once in the master (preload_app) and primed with app.preload(),
+which only imports the libraries, compiles the templates and initializes Plotly, before the
+workers are forked, so every worker starts with these in memory pages shared with the master.
+Each worker then runs app.warmup() after the fork, before it serves requests: the warmup runs
+the analyses, which start threads, and a process must not be forked once it has threads. Set
+GUNICORN_PRELOAD=false to import the app in each worker instead, or APP_WARMUP=false to skip
+the warmup. Workers, binding and timeouts keep gunicorn's usual settings (WEB_CONCURRENCY,
+PORT, ...).
+"""
+import gc
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+APP_WARMUP = os.environ.get('APP_WARMUP', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    # Runs in the master once the app is loaded, before the first worker is forked
+    if server.cfg.workers > 1 and os.environ.get('JOB_BACKEND', 'sqlite') == 'memory':
+        server.log.warning(
+            "JOB_BACKEND=memory with %d workers: each worker keeps its own jobs, so status polls "
+            "that reach another worker find no job. Use JOB_BACKEND=sqlite.", server.cfg.workers,
+        )
+    if not server.cfg.preload_app:
+        return
+    from app import preload
+    preload()
+    # Objects created so far are never collected, so the garbage collector does not write to
+    # (and unshare) the pages the workers inherited
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Runs in each worker, before it accepts connections
+    if APP_WARMUP:
+        from app import warmup
+        warmup()
@@ -0,0 +1,59 @@
+import pandas as pd
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 100_000  # rows per chunk
+
+
+def read_csv_chunks(source, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Read a CSV file in chunks of `chunksize` rows with the schema locked after the first chunk.
+
+    The file is parsed once, by a single chunked reader. The first chunk is read eagerly with
+    normal dtype inference, so malformed files fail here rather than halfway through the
+    analysis, and its column types become the schema of every later chunk: numeric columns that
+    come back as text are coerced to numbers and text columns that come back as numbers are
+    turned back into text, so all chunks share the same column types.
+
+    Args:
+        source: A path or a file-like object positioned at the start of the file.
+        chunksize (int): Number of rows per chunk.
+
+    Returns:
+        Iterator[pd.DataFrame]: The chunks, first chunk included.
+    """
+    reader = pd.read_csv(source, chunksize=chunksize)
+    try:
+        first_chunk = next(reader)
+    except BaseException:
+        reader.close()
+        raise
+    schema = first_chunk.dtypes
+    logger.info(f"CSV schema locked from first chunk: {len(schema)} columns.")
+
+    def generate():
+        with reader:
+            yield first_chunk
+            for chunk in reader:
+                yield _apply_schema(chunk, schema)
+
+    return generate()
+
+
+def _apply_schema(chunk, schema):
+    """
+    Coerce columns of `chunk` whose type drifted away from the locked schema.
+    """
+    for col, dtype in schema.items():
+        if col not in chunk.columns:
+            chunk[col] = pd.Series(index=chunk.index, dtype=dtype)
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_numeric_dtype(chunk[col]):
+            logger.warning(f"Column {col} contains non-numeric values after the first chunk. Coercing to NaN.")
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+        elif dtype == object and chunk[col].dtype != object:
+            # A text column whose values in this chunk all parse as numbers (or are all missing)
+            chunk[col] = chunk[col].astype(str).where(chunk[col].notna())
+    return chunk[schema.index]
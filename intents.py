@@ -0,0 +1,140 @@
+import re
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Queries longer than this are left to the LLM, which can explain nuanced requests
+MAX_LOCAL_QUERY_WORDS = 8
+
+# The only requests answered without the LLM: canned phrases naming analyses, once the filler
+# words below are dropped, alone or joined by "and". A keyword inside any other request ("why are
+# sales missing in march?") is not enough, as it says nothing about what is asked of it.
+CANNED_INTENTS = {
+    "descriptive statistics": ["descriptive_statistics"],
+    "summary statistics": ["descriptive_statistics"],
+    "statistics": ["descriptive_statistics"],
+    "stats": ["descriptive_statistics"],
+    "summary": ["descriptive_statistics"],
+    "summarize": ["descriptive_statistics"],
+    "describe": ["descriptive_statistics"],
+    "correlations": ["correlation_matrix"],
+    "correlation": ["correlation_matrix"],
+    "correlation matrix": ["correlation_matrix"],
+    "correlate": ["correlation_matrix"],
+    "missing values": ["missing_values"],
+    "missing": ["missing_values"],
+    "nulls": ["missing_values"],
+    "null values": ["missing_values"],
+    "value counts": ["value_counts"],
+    "category counts": ["value_counts"],
+    "time series": ["time_series_analysis"],
+    "time series analysis": ["time_series_analysis"],
+    "trends": ["time_series_analysis"],
+    "trends over time": ["time_series_analysis"],
+    "clusters": ["clustering_analysis"],
+    "clustering": ["clustering_analysis"],
+    "cluster": ["clustering_analysis"],
+    "clustering analysis": ["clustering_analysis"],
+    "all analyses": ["descriptive_statistics", "correlation_matrix", "missing_values",
+                     "value_counts", "time_series_analysis", "clustering_analysis"],
+    "everything": ["descriptive_statistics", "correlation_matrix", "missing_values",
+                   "value_counts", "time_series_analysis", "clustering_analysis"],
+}
+
+# Words that may surround a canned phrase without changing it ("please show me the correlations")
+FILLER_WORDS = {"please", "show", "me", "the", "a", "an", "run", "compute", "give", "display",
+                "get", "find", "my", "this", "data", "dataset"}
+
+# Requests that exclude or ask something need the LLM: "no clustering, just statistics",
+# "don't show missing values", "how many empty seats per flight"
+NEGATION_WORDS = {"no", "not", "nor", "never", "without", "except", "excluding", "exclude",
+                  "skip", "only", "just", "but"}
+QUESTION_WORDS = {"what", "why", "how", "which", "who", "whom", "whose", "when", "where", "whether"}
+# Words that ask a question when they open the query ("is revenue related to ...")
+AUXILIARY_WORDS = {"is", "are", "does", "do", "did", "can", "could", "should", "would"}
+
+TIME_SERIES_FREQUENCY_NAMES = {
+    "S": "secondly", "MIN": "minutely", "T": "minutely", "H": "hourly", "D": "daily",
+    "B": "business-daily", "W": "weekly", "M": "monthly", "Q": "quarterly", "Y": "yearly",
+    "A": "yearly",
+}
+
+INTENT_LABELS = {
+    "descriptive_statistics": "descriptive statistics",
+    "correlation_matrix": "a correlation matrix",
+    "missing_values": "a missing values analysis",
+    "value_counts": "value counts for categorical columns",
+    "time_series_analysis": "{article} {frequencies} time series analysis",
+    "clustering_analysis": "a clustering analysis",
+}
+
+
+def normalize_query(user_query):
+    """
+    Lowercase, strip punctuation and collapse whitespace so trivially different phrasings share a cache entry.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", user_query.lower()).split())
+
+
+def classify_query(user_query, analysis_keys, frequencies=('M',)):
+    """
+    Deterministic classifier for canned queries such as "show correlations".
+
+    Args:
+        user_query (str): The natural language query from the user.
+        analysis_keys (Iterable[str]): The valid analysis keys.
+        frequencies (Iterable[str]): The time series period aliases, for the explanation.
+
+    Returns:
+        Optional[Tuple[Dict[str, bool], str]]: Analysis parameters and an explanation, or None when
+        the query is not a canned request (it is too long, negates or asks something, or says more
+        than the names of analyses) and should go to the LLM.
+    """
+    query = normalize_query(user_query)
+    words = query.split()
+    if not words or len(words) > MAX_LOCAL_QUERY_WORDS or _negates_or_asks(user_query, words):
+        return None
+
+    phrases = " ".join(word for word in words if word not in FILLER_WORDS).split(" and ")
+    if not all(phrase in CANNED_INTENTS for phrase in phrases):
+        return None
+    selected = {key for phrase in phrases for key in CANNED_INTENTS[phrase]}
+    analysis_params = {key: key in selected for key in analysis_keys}
+    if not any(analysis_params.values()):
+        return None
+
+    logger.info(f"Query interpreted locally as: {', '.join(sorted(selected))}")
+    labels = [intent_label(key, frequencies) for key in sorted(analysis_params) if analysis_params[key]]
+    explanation = f"Based on your query, the platform will run {_join_labels(labels)} on your dataset."
+    return analysis_params, explanation
+
+
+def intent_label(analysis_key, frequencies=('M',)):
+    """
+    How the explanation of a local answer names an analysis, e.g. "a weekly time series analysis".
+    """
+    names = _join_labels(list(dict.fromkeys(_frequency_name(freq) for freq in frequencies)) or ["monthly"])
+    article = "an" if names.startswith(("a", "e", "i", "o", "u", "hour")) else "a"
+    return INTENT_LABELS[analysis_key].format(article=article, frequencies=names)
+
+
+def _negates_or_asks(user_query, words):
+    # Contractions are split by normalize_query ("don't" -> "don t"), so look at the raw text
+    if "?" in user_query or re.search(r"n['’]t\b", user_query.lower()):
+        return True
+    if words[0] in AUXILIARY_WORDS:
+        return True
+    return any(word in NEGATION_WORDS or word in QUESTION_WORDS for word in words)
+
+
+def _frequency_name(freq):
+    alias = re.sub(r"^\d+", "", freq).split("-")[0].upper()
+    return TIME_SERIES_FREQUENCY_NAMES.get(alias, f"'{freq}'")
+
+
+def _join_labels(labels):
+    if len(labels) == 1:
+        return labels[0]
+    return ", ".join(labels[:-1]) + " and " + labels[-1]
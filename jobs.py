@@ -0,0 +1,194 @@
+import os
+import time
+import uuid
+import pickle
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+# Jobs that no longer change. Only these expire: `updated` is then the time the job finished,
+# whereas a long analysis may go without updates for longer than the TTL while it runs.
+FINISHED = (DONE, FAILED)
+
+# Columns of a job record other than its result, which is only loaded when asked for
+STATUS_COLUMNS = ('id', 'status', 'stage', 'progress', 'error', 'created', 'updated')
+
+# Share of the job completed once each stage starts, for progress reporting
+STAGE_PROGRESS = {
+    QUEUED: 0,
+    'processing': 10,
+    'analysis': 40,
+    'visualization': 80,
+    DONE: 100,
+}
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while the queue is at capacity.
+    """
+
+
+class MemoryJobStore:
+    """
+    Job records kept in the memory of the current process.
+    """
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def create(self, job_id):
+        now = time.time()
+        with self.lock:
+            self.jobs[job_id] = {
+                'id': job_id, 'status': QUEUED, 'stage': QUEUED, 'progress': 0,
+                'error': None, 'result': None, 'created': now, 'updated': now,
+            }
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields, updated=time.time())
+
+    def get(self, job_id, result=False):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return dict(job) if result else {key: value for key, value in job.items() if key != 'result'}
+
+    def purge(self, older_than):
+        cutoff = time.time() - older_than
+        with self.lock:
+            for job_id, job in list(self.jobs.items()):
+                if job['status'] in FINISHED and job['updated'] < cutoff:
+                    del self.jobs[job_id]
+
+
+class SQLiteJobStore:
+    """
+    Job records in a SQLite file, so any gunicorn worker can answer status polls for a job
+    that another worker is running.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT NOT NULL, progress INTEGER NOT NULL, '
+                'error TEXT, result BLOB, created REAL NOT NULL, updated REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def create(self, job_id):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, stage, progress, created, updated) VALUES (?, ?, ?, 0, ?, ?)',
+                (job_id, QUEUED, QUEUED, now, now),
+            )
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = sqlite3.Binary(pickle.dumps(fields['result'], protocol=pickle.HIGHEST_PROTOCOL))
+        fields['updated'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id, result=False):
+        columns = STATUS_COLUMNS + ('result',) if result else STATUS_COLUMNS
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(f'SELECT {", ".join(columns)} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job.get('result') is not None:
+            job['result'] = pickle.loads(job['result'])
+        return job
+
+    def purge(self, older_than):
+        with self._connect() as conn:
+            conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?', (*FINISHED, time.time() - older_than),
+            )
+
+
+class JobQueue:
+    """
+    Bounded worker pool for long-running jobs. At most `max_workers` jobs run at once and at
+    most `max_pending` are accepted (queued plus running); beyond that `submit` raises
+    QueueFullError so callers can apply backpressure.
+    """
+    def __init__(self, store, max_workers=2, max_pending=8, job_ttl=3600):
+        self.store = store
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue `fn(progress, *args, **kwargs)` and return the job id. `progress(stage)` records the
+        stage the job has reached; the return value of `fn` becomes the job result.
+        """
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} jobs pending).")
+            self.pending += 1
+        self.store.purge(self.job_ttl)
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id)
+        self.executor.submit(self._run, job_id, fn, args, kwargs)
+        logger.info(f"Job {job_id} queued.")
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs):
+        def progress(stage):
+            self.store.update(job_id, stage=stage, progress=STAGE_PROGRESS.get(stage, 0))
+
+        try:
+            self.store.update(job_id, status=RUNNING)
+            result = fn(progress, *args, **kwargs)
+            self.store.update(job_id, status=DONE, stage=DONE, progress=100, result=result)
+            logger.info(f"Job {job_id} finished.")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def get(self, job_id, result=False):
+        """
+        The job record, or None for an unknown or expired job. Its 'result' is only included
+        with `result=True`, so status polls do not load (or unpickle) it.
+        """
+        return self.store.get(job_id, result=result)
+
+
+def create_job_queue(backend_name, directory='jobs', max_workers=2, max_pending=8, job_ttl=3600):
+    """
+    Build a job queue whose records live in memory ('memory') or in a SQLite file ('sqlite').
+    """
+    if backend_name == 'sqlite':
+        store = SQLiteJobStore(os.path.join(directory, 'jobs.sqlite3'))
+    else:
+        if backend_name != 'memory':
+            logger.warning(f"Unknown job store backend '{backend_name}'. Falling back to memory.")
+        store = MemoryJobStore()
+    return JobQueue(store, max_workers=max_workers, max_pending=max_pending, job_ttl=job_ttl)
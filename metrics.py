@@ -0,0 +1,266 @@
+import sys
+import math
+import time
+import logging
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+MEMORY_BUCKETS = tuple(2 ** power for power in range(20, 34, 2))  # 1 MiB to 8 GiB
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+# Spans of the current request or job, for the Server-Timing header
+_trace = contextvars.ContextVar('metrics_trace', default=None)
+# Highest traced peak seen by each open traced_peak() block, across tracemalloc peak resets
+_open_peaks = {}
+_peaks_lock = threading.Lock()
+
+
+class Histogram:
+    """
+    Prometheus histogram with cumulative buckets, one series per combination of label values.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DURATION_BUCKETS, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self.lock:
+            counts, total, count = self.series.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.series[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        with self.lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self.series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            labels = dict(zip(self.label_names, key))
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, bucket_count
+            yield f"{self.name}_bucket", {**labels, 'le': '+Inf'}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class Counter:
+    """
+    Prometheus counter, one series per combination of label values.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + value
+
+    def samples(self):
+        with self.lock:
+            series = dict(self.series)
+        for key, value in sorted(series.items()):
+            yield self.name, dict(zip(self.label_names, key)), value
+
+
+class MetricsRegistry:
+    """
+    The metrics of this process, rendered in the Prometheus text exposition format.
+
+    Collectors are callables returning (name, kind, help, [(labels, value), ...]) tuples for
+    values read at scrape time, such as the cache hit counters.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS, label_names=()):
+        return self._register(Histogram(name, help_text, buckets, label_names))
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(_format_sample(name, labels, value) for name, labels, value in metric.samples())
+        for collector in self.collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+                continue
+            for name, kind, help_text, samples in collected:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(_format_sample(name, labels, value) for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    'analytiq_stage_duration_seconds', 'Time spent in each pipeline stage.',
+    DURATION_BUCKETS, ('stage', 'rows', 'columns'),
+)
+STAGE_RSS_BYTES = REGISTRY.histogram(
+    'analytiq_stage_peak_rss_increase_bytes', 'Growth of the peak resident set size during each stage.',
+    MEMORY_BUCKETS, ('stage',),
+)
+STAGE_TRACED_BYTES = REGISTRY.histogram(
+    'analytiq_stage_traced_peak_bytes', 'Peak Python allocations above the start of each stage (tracemalloc).',
+    MEMORY_BUCKETS, ('stage',),
+)
+STAGE_ERRORS = REGISTRY.counter('analytiq_stage_errors_total', 'Stages that raised an exception.', ('stage',))
+ANALYSIS_TIMEOUTS = REGISTRY.counter(
+    'analytiq_analysis_timeouts_total',
+    'Analyses dropped after their timeout, by whether they were still queued or already running.',
+    ('analysis', 'state'),
+)
+ANALYSIS_OVERRUN_SECONDS = REGISTRY.histogram(
+    'analytiq_analysis_overrun_seconds',
+    'Time a timed-out analysis kept running in the background until it stopped.',
+    DURATION_BUCKETS, ('analysis',),
+)
+
+
+@contextmanager
+def span(stage, rows=None, columns=None):
+    """
+    Time a pipeline stage and record its duration, peak RSS growth and, while tracemalloc is
+    tracing, its peak traced allocations. `rows` and `columns` label the duration by order of
+    magnitude ("1e3" for 101 to 1,000 rows) to keep the number of series bounded.
+
+    Peaks are process-wide, so for concurrent stages they are upper bounds.
+    """
+    started = time.perf_counter()
+    rss_before = _peak_rss()
+    traced = {}
+    try:
+        with traced_peak() as traced:
+            yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage, rows=size_class(rows), columns=size_class(columns))
+        if rss_before is not None:
+            STAGE_RSS_BYTES.observe(_peak_rss() - rss_before, stage=stage)
+        if 'bytes' in traced:
+            STAGE_TRACED_BYTES.observe(traced['bytes'], stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+
+@contextmanager
+def traced_peak():
+    """
+    Measure the peak traced allocations of a block above its start, as {'bytes': peak}, while
+    tracemalloc is tracing (an empty dict otherwise).
+
+    Each block resets the tracemalloc peak when it starts; the peak reached so far is first
+    folded into every open block, so enclosing blocks still see the peaks of nested ones.
+    """
+    measurement = {}
+    if not tracemalloc.is_tracing():
+        yield measurement
+        return
+    token = object()
+    with _peaks_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        for open_token, open_peak in _open_peaks.items():
+            _open_peaks[open_token] = max(open_peak, peak)
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        _open_peaks[token] = start
+    try:
+        yield measurement
+    finally:
+        with _peaks_lock:
+            peak = max(_open_peaks.pop(token), tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0)
+        measurement['bytes'] = max(0, peak - start)
+
+
+def start_trace():
+    """
+    Collect the spans of the current request (and the threads it starts with the current
+    context) for server_timing().
+    """
+    _trace.set([])
+
+
+def server_timing():
+    """
+    The spans collected since start_trace() as a Server-Timing header value, or None.
+    """
+    trace = _trace.get()
+    if not trace:
+        return None
+    return ', '.join(f"{stage.replace('.', '-')};dur={elapsed * 1000:.1f}" for stage, elapsed in trace)
+
+
+def size_class(count):
+    """
+    The power of ten at or above `count`, as a label ("1e0", "1e1", ...), or "" when unknown.
+    """
+    if count is None:
+        return ''
+    return f"1e{max(0, math.ceil(math.log10(count))) if count > 0 else 0}"
+
+
+def _peak_rss():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def _format_value(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _escape(label):
+    return str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_sample(name, labels, value):
+    if labels:
+        rendered = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        return f"{name}{{{rendered}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
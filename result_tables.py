@@ -0,0 +1,111 @@
+import math
+import itertools
+import numbers
+import logging
+from correlation import correlation_pairs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Analysis sections shown as tables on the analysis page, with their tab titles
+TABLE_SECTIONS = {
+    "descriptive_statistics": "Statistics",
+    "correlation_matrix": "Correlations",
+    "missing_values": "Missing Values",
+    "value_counts": "Value Counts",
+    "clustering_analysis": "Clusters",
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def table_page(section, data, offset=0, limit=DEFAULT_PAGE_SIZE, column_offset=0,
+               column_limit=DEFAULT_PAGE_SIZE, column=None):
+    """
+    One page of an analysis section as a table: {"columns": [header, ...], "rows": [[label,
+    value, ...], ...], "total_rows": n, "offset": ..., "limit": ...}, with JSON-ready cells.
+
+    Only the rows of the page are built, so a page costs the same whatever the size of the
+    section. Descriptive statistics have one row per column of the dataset; the correlation
+    matrix is also paged by column (`column_offset`, `column_limit`), and the correlations of
+    wide data are listed one pair per row, strongest first; value counts are those of
+    one `column` (the first by default), most frequent first, with the total count of the
+    values after the page as "remaining_count".
+
+    Raises KeyError for an unknown section or value counts column.
+    """
+    if section not in TABLE_SECTIONS:
+        raise KeyError(section)
+    offset = max(0, offset)
+    limit = min(max(1, limit), MAX_PAGE_SIZE)
+    page = {"section": section, "offset": offset, "limit": limit, "total_rows": len(data)}
+
+    if section == "descriptive_statistics":
+        stats = list(dict.fromkeys(stat for values in data.values() for stat in values))
+        page["columns"] = ["Column", *stats]
+        page["rows"] = [
+            [_cell(col), *(_cell(values.get(stat)) for stat in stats)]
+            for col, values in _slice(data, offset, limit)
+        ]
+    elif section == "correlation_matrix" and correlation_pairs(data) is not None:
+        pairs = correlation_pairs(data)
+        page["total_rows"] = len(pairs)
+        page["columns"] = ["Column", "Column", "Correlation"]
+        page["rows"] = [
+            [_cell(pair["column_a"]), _cell(pair["column_b"]), _cell(pair["correlation"])]
+            for pair in pairs[offset:offset + limit]
+        ]
+    elif section == "correlation_matrix":
+        column_offset = max(0, column_offset)
+        column_limit = min(max(1, column_limit), MAX_PAGE_SIZE)
+        columns = list(itertools.islice(data, column_offset, column_offset + column_limit))
+        page.update(column_offset=column_offset, column_limit=column_limit, total_columns=len(data))
+        page["columns"] = ["", *map(_cell, columns)]
+        page["rows"] = [
+            [_cell(row_key), *(_cell(row.get(col)) for col in columns)]
+            for row_key, row in _slice(data, offset, limit)
+        ]
+    elif section == "value_counts":
+        column = next(iter(data), None) if column is None else _find_key(data, column)
+        counts = data.get(column, {})
+        page["value_columns"] = [{"name": _cell(col), "distinct": len(values)} for col, values in data.items()]
+        page["column"] = _cell(column)
+        page["total_rows"] = len(counts)
+        page["columns"] = ["Value", "Count"]
+        page["rows"] = [[_cell(value), _cell(count)] for value, count in _slice(counts, offset, limit)]
+        page["remaining_count"] = sum(
+            count for count in itertools.islice(counts.values(), offset + limit, None)
+            if isinstance(count, numbers.Number)
+        )
+    else:
+        label = "Column" if section == "missing_values" else "Cluster"
+        page["columns"] = [label, "Missing Values" if section == "missing_values" else "Count"]
+        page["rows"] = [[_cell(key), _cell(value)] for key, value in _slice(data, offset, limit)]
+    return page
+
+
+def _slice(mapping, offset, limit):
+    return itertools.islice(mapping.items(), offset, offset + limit)
+
+
+def _find_key(mapping, name):
+    """
+    The key of `mapping` named `name`; query strings carry column names as text.
+    """
+    if name in mapping:
+        return name
+    for key in mapping:
+        if str(key) == name:
+            return key
+    raise KeyError(name)
+
+
+def _cell(value):
+    if isinstance(value, numbers.Number) and hasattr(value, 'item'):
+        value = value.item()  # NumPy scalar
+    if isinstance(value, float) and not math.isfinite(value):
+        return None  # JSON has no NaN or infinity
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    return str(value)
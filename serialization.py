@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Exact types that are already native and never missing
+_PASSTHROUGH_TYPES = (int, str, bool, type(None))
+
+
+def to_native(value):
+    """
+    Convert a result (nested dicts and lists of scalars, Series or DataFrames) to native Python
+    types. NumPy scalars become Python scalars and missing values (NaN, NaT, pd.NA) become None.
+    Series and DataFrames are converted a column at a time, like series_to_dict and frame_to_dict.
+    """
+    value_type = type(value)
+    if value_type is dict:
+        return {key: to_native(item) for key, item in value.items()}
+    if value_type is list:
+        return [to_native(item) for item in value]
+    if value_type in _PASSTHROUGH_TYPES:
+        return value
+    if value_type is float:
+        return None if value != value else value
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        value = value.item()
+        return None if value != value else value
+    if isinstance(value, pd.DataFrame):
+        return frame_to_dict(value)
+    if isinstance(value, pd.Series):
+        return series_to_dict(value)
+    if pd.isnull(value):
+        return None
+    return value
+
+
+def series_to_dict(series):
+    """
+    Series.to_dict() with native values and None for missing values, converted in one pass.
+    """
+    return dict(zip(series.index.tolist(), _native_values(series)))
+
+
+def frame_to_dict(df):
+    """
+    DataFrame.to_dict() ({column: {index: value}}) with native values and None for missing values.
+    Frames with a single numeric dtype (correlation matrices, numeric time series) are converted
+    as one block.
+    """
+    keys = df.index.tolist()
+    columns = df.columns.tolist()
+    if len(columns) > 0 and all(dtype.kind in 'iubf' for dtype in df.dtypes):
+        block = df.to_numpy().T
+        rows = block.tolist()
+        if block.dtype.kind == 'f':
+            for column, position in zip(*np.nonzero(np.isnan(block))):
+                rows[column][position] = None
+        return {column: dict(zip(keys, row)) for column, row in zip(columns, rows)}
+    return {column: dict(zip(keys, _native_values(df.iloc[:, i]))) for i, column in enumerate(columns)}
+
+
+def _native_values(series):
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iub':
+        return series.to_numpy().tolist()
+    if isinstance(dtype, np.dtype) and dtype.kind == 'f':
+        array = series.to_numpy()
+        values = array.tolist()
+        for position in np.flatnonzero(np.isnan(array)):
+            values[position] = None
+        return values
+    # Datetimes keep their Timestamps; object, category and extension values are converted one by one
+    missing = series.isna().to_numpy()
+    values = series.tolist()
+    for position, value in enumerate(values):
+        if missing[position]:
+            values[position] = None
+        elif isinstance(value, np.generic):
+            values[position] = value.item()
+    return values
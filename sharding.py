@@ -0,0 +1,205 @@
+import os
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import pyarrow as pa
+import pandas as pd
+from stats_engine import APPROXIMATE_BLOCK_ROWS, exact_quantiles
+from cancellation import AnalysisCancelled, check_cancelled
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHARED_MEMORY_DIR = '/dev/shm'
+# How often a caller waiting for its shards checks whether its analysis was cancelled
+CANCEL_POLL_SECONDS = 0.1
+
+
+class ShardingEngine:
+    """
+    Row-sharded aggregation of a DataFrame on a pool of `processes` worker processes.
+
+    Frames of at least `min_rows` rows are written once to an uncompressed Arrow IPC file in
+    `directory` (by default shared memory, /dev/shm, when it has room, else the temporary
+    directory) and split into one range of rows per process. Every worker memory-maps the file,
+    converts only its own rows to pandas and folds them into a StatsAccumulator and a
+    TimeSeriesRollup, and only these partial states travel back. They are merged in row order,
+    into the same state a single scan of the frame builds, up to floating point rounding; in
+    approximate mode shards start on the block boundaries of StatsAccumulator.update, so the
+    sketches are identical too. Exact quantiles do not merge across rows, so they are computed
+    by column instead, each worker reading whole columns from the same file.
+
+    `processes` of 0 or 1 disables sharding. The pool is started on first use, with the
+    forkserver start method where available so that request threads are never forked, and is
+    shared by the requests of the process; as with any multiprocessing, a script using it needs
+    the `if __name__ == '__main__'` guard. Frames Arrow cannot hold and failed workers fall back
+    to a scan in the calling process.
+    """
+    def __init__(self, processes=0, min_rows=1_000_000, directory=None):
+        self.processes = processes
+        self.min_rows = min_rows
+        self.directory = directory
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def enabled_for(self, n_rows):
+        """
+        Whether a frame of `n_rows` rows is aggregated in shards.
+        """
+        return self.processes > 1 and n_rows >= self.min_rows
+
+    def aggregate(self, df, stats=None, rollup=None, quantile_columns=()):
+        """
+        Fold the rows of `df` into an empty StatsAccumulator `stats` and TimeSeriesRollup
+        `rollup` (either can be None).
+
+        Returns:
+            tuple: `stats`, `rollup` and the exact_quantiles of `quantile_columns` (None
+                without columns).
+        """
+        if not self.enabled_for(len(df)):
+            return _aggregate_locally(df, stats, rollup, quantile_columns)
+        path = None
+        try:
+            path = self._write(df)
+            # Approximate statistics are folded in blocks; shards keep to the same blocks
+            align = APPROXIMATE_BLOCK_ROWS if stats is not None and stats.approximate else 1
+            shard_rows = -(-len(df) // (self.processes * align)) * align
+            bounds = [(start, min(start + shard_rows, len(df))) for start in range(0, len(df), shard_rows)]
+            pool = self._executor()
+            futures = [pool.submit(_aggregate_shard, path, start, stop, stats, rollup) for start, stop in bounds]
+            column_groups = [list(quantile_columns[i::self.processes]) for i in range(self.processes)]
+            quantile_futures = [pool.submit(_shard_quantiles, path, columns) for columns in column_groups if columns]
+            shards = _results(futures)
+            quantiles = _results(quantile_futures)
+        except (pa.ArrowException, OSError, BrokenProcessPool) as e:
+            logger.warning(f"Sharded aggregation failed ({e}); aggregating in this process.")
+            if isinstance(e, BrokenProcessPool):
+                self._reset()
+            return _aggregate_locally(df, stats, rollup, quantile_columns)
+        finally:
+            if path is not None:
+                _remove(path)
+
+        for partials, shard_rollup in shards:
+            for partial in partials:
+                stats.merge(partial)
+            if rollup is not None:
+                rollup.merge(shard_rollup)
+        quantiles = pd.concat(quantiles, axis=1)[list(quantile_columns)] if quantiles else None
+        logger.info(f"Aggregated {len(df)} rows in {len(bounds)} shards on {self.processes} processes.")
+        return stats, rollup, quantiles
+
+    def _write(self, df):
+        if not all(isinstance(col, str) for col in df.columns):
+            raise pa.ArrowInvalid("Arrow files only hold string column names")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        directory = self.directory or _shard_directory(table.nbytes)
+        path = os.path.join(directory, f"analytiq-shards-{uuid.uuid4().hex}.arrow")
+        try:
+            with pa.ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+        except BaseException:
+            _remove(path)
+            raise
+        return path
+
+    def _executor(self):
+        with self._lock:
+            if self._pool_pid != os.getpid():
+                # A pool started before this process was forked (e.g. in a preloaded gunicorn
+                # master) belongs to the parent
+                self._pool = None
+            if self._pool is None:
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    # Workers fork from a server that has this module, pandas and pyarrow imported
+                    context.set_forkserver_preload([__name__])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=context)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _reset(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pool_pid == os.getpid():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """
+        Stop the worker processes; the next sharded aggregation starts new ones.
+        """
+        self._reset()
+
+
+def _aggregate_shard(path, start, stop, stats, rollup):
+    """
+    Worker side: the partial states of rows [start, stop) of the Arrow file at `path`, as the
+    list of StatsAccumulator partials `update` would merge and the updated `rollup`.
+    """
+    # Memory-mapped, so the worker only reads the pages of its rows
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all().slice(start, stop - start)
+    df = table.to_pandas(split_blocks=True)
+    partials = list(stats.partials(df)) if stats is not None else []
+    if rollup is not None:
+        rollup.update(df)
+    return partials, rollup
+
+
+def _shard_quantiles(path, columns):
+    """
+    Worker side: the exact quantiles of `columns` of the Arrow file at `path`.
+    """
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all().select(columns)
+    return exact_quantiles(table.to_pandas(split_blocks=True), columns)
+
+
+def _results(futures):
+    # Shards already running in a worker finish there; the ones still queued are dropped
+    results = []
+    try:
+        for future in futures:
+            while True:
+                try:
+                    results.append(future.result(timeout=CANCEL_POLL_SECONDS))
+                    break
+                except FutureTimeoutError:
+                    check_cancelled()
+    except AnalysisCancelled:
+        for future in futures:
+            future.cancel()
+        raise
+    return results
+
+
+def _aggregate_locally(df, stats, rollup, quantile_columns):
+    if stats is not None:
+        stats.update(df)
+    if rollup is not None:
+        rollup.update(df)
+    quantiles = exact_quantiles(df, list(quantile_columns)) if len(quantile_columns) else None
+    return stats, rollup, quantiles
+
+
+def _shard_directory(nbytes):
+    # Shared memory when it can hold the file with room to spare (containers often give it 64 MB)
+    if os.path.isdir(SHARED_MEMORY_DIR) and os.access(SHARED_MEMORY_DIR, os.W_OK):
+        if shutil.disk_usage(SHARED_MEMORY_DIR).free > 2 * nbytes:
+            return SHARED_MEMORY_DIR
+    return tempfile.gettempdir()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,166 @@
+import pandas as pd
+import numpy as np
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch over floats. Memory is O(k) regardless of the number of values, and
+    the rank error of a quantile query is roughly 1.7 / k (about 1% for the default k=200).
+    Two sketches built over different chunks or partitions can be merged.
+    """
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.levels = [np.empty(0)]
+        self.n = 0
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        self.n += other.n
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # Keep one item back when the count is odd, promote every other item of the rest
+                keep = items[:len(items) % 2]
+                items = items[len(items) % 2:]
+                promoted = items[self.rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # Capacities depend on the depth, so start over from the bottom
+                level = 0
+                continue
+            level += 1
+
+    def quantiles(self, qs):
+        """
+        Approximate quantiles for each q in `qs` (values in [0, 1]).
+        """
+        if self.n == 0:
+            return [np.nan for _ in qs]
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype='float64') for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        total = cumulative[-1]
+        positions = np.searchsorted(cumulative, np.asarray(qs) * total, side='left')
+        return [items[min(position, len(items) - 1)] for position in positions]
+
+
+class SpaceSavingSketch:
+    """
+    Mergeable heavy-hitter summary keeping at most `capacity` counters. Reported counts
+    overestimate true counts by at most `floor`, which is bounded by n / capacity, so every
+    item with frequency above n / capacity is guaranteed to be kept.
+    """
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='float64')
+        self.floor = 0.0
+        self.n = 0
+
+    def update(self, values):
+        values = pd.Series(values)
+        self.n += int(values.notna().sum())
+        counts = values.value_counts()
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Unused categories come back with a count of zero
+            counts = counts[counts > 0]
+            counts.index = counts.index.astype(values.cat.categories.dtype)
+        return self._merge_counts(counts.astype('float64'), 0.0)
+
+    def merge(self, other):
+        self.n += other.n
+        return self._merge_counts(other.counts, other.floor)
+
+    def _merge_counts(self, counts, floor):
+        # Items missing from one summary may have been evicted there with up to its floor count
+        merged = self.counts.add(counts, fill_value=0)
+        merged = merged + np.where(merged.index.isin(self.counts.index), 0.0, self.floor)
+        merged = merged + np.where(merged.index.isin(counts.index), 0.0, floor)
+        floor = self.floor + floor
+        if len(merged) > self.capacity:
+            merged = merged.sort_values(ascending=False, kind='stable')
+            floor = max(floor, merged.iloc[self.capacity])
+            merged = merged.iloc[:self.capacity]
+        self.counts = merged
+        self.floor = floor
+        return self
+
+    def top(self, k):
+        """
+        The `k` most frequent items with their estimated counts, most frequent first.
+        """
+        return self.counts.sort_values(ascending=False, kind='stable').iloc[:k].round().astype('int64')
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count estimator with 2**precision registers. The relative standard
+    error is about 1.04 / sqrt(2**precision), i.e. 1.6% at the default precision of 12.
+    """
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype='uint8')
+
+    def update(self, values):
+        values = pd.Series(values).dropna()
+        if len(values) == 0:
+            return self
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        index = (hashes >> np.uint64(64 - self.precision)).astype('int64')
+        remainder = hashes << np.uint64(self.precision)
+        # Rank is the position of the leftmost set bit in the remaining 64 - precision bits
+        bits = 64 - self.precision
+        with np.errstate(divide='ignore'):
+            leading = np.where(remainder == 0, bits, 63 - np.floor(np.log2(remainder.astype('float64'))))
+        rank = np.minimum(leading, bits).astype('int64') + 1
+        # Histogram of (register, rank) pairs; the highest rank present per register wins
+        seen = np.bincount(index * 64 + rank, minlength=len(self.registers) * 64).reshape(-1, 64) > 0
+        highest = np.where(seen.any(axis=1), 63 - np.argmax(seen[:, ::-1], axis=1), 0).astype('uint8')
+        self.registers = np.maximum(self.registers, highest)
+        return self
+
+    def merge(self, other):
+        self.registers = np.maximum(self.registers, other.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype('float64')))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros > 0:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
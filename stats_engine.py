@@ -0,0 +1,390 @@
+import pandas as pd
+import numpy as np
+import logging
+from sketches import KLLSketch, SpaceSavingSketch, HyperLogLog
+from cancellation import check_cancelled
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NUMERIC_ROWS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+DATETIME_ROWS = ['count', 'mean', 'min', '25%', '50%', '75%', 'max']
+CATEGORICAL_ROWS = ['count', 'unique', 'top', 'freq']
+QUANTILES = [0.25, 0.5, 0.75]
+APPROXIMATE_BLOCK_ROWS = 100_000
+# Columns per batch of exact quantiles
+QUANTILE_BATCH_COLUMNS = 32
+
+
+class StatsAccumulator:
+    """
+    Single-pass, mergeable accumulator for the statistics behind descriptive_statistics,
+    correlation_matrix, missing_values and value_counts.
+
+    Each call to `update` scans a frame once and folds its partial state into the running
+    state with Chan's parallel update, so chunks and partitions can be accumulated in any
+    order and combined with `merge`. Column moments are kept as (count, mean, M2) and the
+    correlation matrix as pairwise-complete co-moments, matching DataFrame.corr().
+
+    With `approximate=True`, quantiles, category frequencies and distinct counts come from
+    streaming sketches instead, so memory stays flat for high-cardinality columns:
+    `quantile_k` sets the KLL rank error (about 1.7 / k), `top_k` the number of categories
+    reported per column (counts are tracked for 4 * top_k items), and `hll_precision` the
+    HyperLogLog distinct-count error (about 1.04 / sqrt(2**precision)).
+    """
+    def __init__(self, track_covariance=True, track_frequencies=True, approximate=False,
+                 quantile_k=200, top_k=50, hll_precision=12):
+        self.track_covariance = track_covariance
+        self.track_frequencies = track_frequencies
+        self.approximate = approximate
+        self.quantile_k = quantile_k
+        self.top_k = top_k
+        self.hll_precision = hll_precision
+        self.columns = None
+        self.numeric_cols = []
+        self.datetime_cols = []
+        self.categorical_cols = []
+        self.value_count_cols = []  # object and category columns, the value_counts analysis subset
+        self.n_rows = 0
+        self.null_counts = None
+        # Per-column moments of numeric and datetime columns (datetimes as nanoseconds,
+        # so datetime means are only accurate to about a microsecond)
+        self.count = self.mean = self.m2 = None
+        self.minimum = self.maximum = None
+        # Pairwise-complete co-moments of the numeric columns
+        self.pair_count = self.pair_mean = self.pair_m2 = self.comoment = None
+        self.frequencies = {}
+        # Sketches, populated in approximate mode only
+        self.quantile_sketches = {}
+        self.distinct_sketches = {}
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        accumulator = cls(**kwargs)
+        accumulator.update(df)
+        return accumulator
+
+    def _bind(self, df):
+        self.columns = df.columns
+        self.numeric_cols = df.select_dtypes(include='number').columns.tolist()
+        self.datetime_cols = df.select_dtypes(include=['datetime', 'datetime64']).columns.tolist()
+        moment_cols = set(self.numeric_cols) | set(self.datetime_cols)
+        self.categorical_cols = [col for col in df.columns if col not in moment_cols]
+        self.value_count_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+
+    def update(self, df):
+        """
+        Fold one frame (a chunk or a partition) into the running statistics.
+        """
+        for partial in self.partials(df):
+            self.merge(partial)
+        return self
+
+    def partials(self, df):
+        """
+        The partial states `update` folds in for `df`, one per block, so that a frame can be
+        scanned elsewhere, e.g. in another process, and merged in row order with `merge`.
+        """
+        if self.columns is None:
+            self._bind(df)
+        # In approximate mode large frames are folded in blocks so frequency tables stay bounded
+        block_rows = APPROXIMATE_BLOCK_ROWS if self.approximate else max(len(df), 1)
+        for start in range(0, max(len(df), 1), block_rows):
+            check_cancelled()
+            yield self._partial(df.iloc[start:start + block_rows])
+
+    def _partial(self, df):
+        partial = StatsAccumulator(
+            self.track_covariance, self.track_frequencies, self.approximate,
+            self.quantile_k, self.top_k, self.hll_precision,
+        )
+        partial.columns = self.columns
+        partial.numeric_cols = self.numeric_cols
+        partial.datetime_cols = self.datetime_cols
+        partial.categorical_cols = self.categorical_cols
+        partial.value_count_cols = self.value_count_cols
+        partial.n_rows = len(df)
+        partial.null_counts = df.isnull().sum().reindex(self.columns, fill_value=0)
+
+        moment_cols = self.numeric_cols + self.datetime_cols
+        if moment_cols:
+            # Column-major so the reductions below use pairwise summation per column
+            values = np.empty((len(df), len(moment_cols)), dtype='float64', order='F')
+            origins = np.zeros(len(moment_cols))
+            for i, col in enumerate(moment_cols):
+                check_cancelled()
+                if col in self.datetime_cols:
+                    # Measure from the first timestamp so the float moments keep sub-microsecond precision
+                    valid = df[col].notna().to_numpy()
+                    ints = df[col].to_numpy(dtype='datetime64[ns]').view('int64')
+                    origin = ints[valid][0] if valid.any() else 0
+                    values[:, i] = np.where(valid, ints - origin, np.nan)
+                    origins[i] = origin
+                else:
+                    values[:, i] = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            check_cancelled()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                partial.count = np.sum(~np.isnan(values), axis=0).astype('float64')
+                partial.mean = np.where(partial.count > 0, np.nansum(values, axis=0) / np.maximum(partial.count, 1), 0.0)
+                # Corrected two-pass: the residual sum refines the mean and the variance together
+                residual = values - partial.mean
+                residual_sum = np.nansum(residual, axis=0)
+                partial.mean = partial.mean + residual_sum / np.maximum(partial.count, 1)
+                partial.m2 = np.nansum(residual ** 2, axis=0) - residual_sum ** 2 / np.maximum(partial.count, 1)
+            check_cancelled()
+            partial.minimum = np.nanmin(values, axis=0, initial=np.inf, where=~np.isnan(values))
+            partial.maximum = np.nanmax(values, axis=0, initial=-np.inf, where=~np.isnan(values))
+            partial.mean = partial.mean + origins
+            for i, col in enumerate(moment_cols[len(self.numeric_cols):], start=len(self.numeric_cols)):
+                partial.minimum[i] = df[col].min().value if partial.count[i] > 0 else np.inf
+                partial.maximum[i] = df[col].max().value if partial.count[i] > 0 else -np.inf
+
+            if self.approximate:
+                partial.quantile_sketches = {
+                    col: KLLSketch(self.quantile_k).update(values[:, i] + origins[i])
+                    for i, col in enumerate(moment_cols)
+                }
+
+            if self.track_covariance and self.numeric_cols:
+                check_cancelled()
+                numeric = values[:, :len(self.numeric_cols)]
+                self._partial_comoments(partial, numeric, partial.mean[:len(self.numeric_cols)])
+
+        check_cancelled()
+        if self.track_frequencies and self.approximate:
+            partial.frequencies = {
+                col: SpaceSavingSketch(4 * self.top_k).update(df[col]) for col in self.categorical_cols
+            }
+            partial.distinct_sketches = {
+                col: HyperLogLog(self.hll_precision).update(df[col]) for col in self.categorical_cols
+            }
+        elif self.track_frequencies:
+            partial.frequencies = {col: _frequencies(df[col]) for col in self.categorical_cols}
+        return partial
+
+    @staticmethod
+    def _partial_comoments(partial, values, shift):
+        # Centre on the chunk means first so the raw sums below do not suffer from cancellation
+        present = ~np.isnan(values)
+        centred = np.where(present, values - shift, 0.0)
+        present = present.astype('float64')
+        pair_count = present.T @ present
+        pair_sum = centred.T @ present
+        pair_sum_sq = (centred ** 2).T @ present
+        safe_count = np.maximum(pair_count, 1)
+        partial.pair_count = pair_count
+        partial.pair_mean = np.where(pair_count > 0, pair_sum / safe_count + shift[:, None], 0.0)
+        partial.pair_m2 = np.where(pair_count > 0, pair_sum_sq - pair_sum ** 2 / safe_count, 0.0)
+        partial.comoment = np.where(pair_count > 0, centred.T @ centred - pair_sum * pair_sum.T / safe_count, 0.0)
+
+    def merge(self, other):
+        """
+        Combine the state of another accumulator over the same columns into this one.
+        """
+        if other.columns is None:
+            return self
+        if self.null_counts is None:
+            self.columns = other.columns
+            self.numeric_cols = other.numeric_cols
+            self.datetime_cols = other.datetime_cols
+            self.categorical_cols = other.categorical_cols
+            self.value_count_cols = other.value_count_cols
+            self.n_rows = other.n_rows
+            self.null_counts = other.null_counts.copy()
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            self.pair_count, self.pair_mean = other.pair_count, other.pair_mean
+            self.pair_m2, self.comoment = other.pair_m2, other.comoment
+            self.frequencies = dict(other.frequencies)
+            self.quantile_sketches = dict(other.quantile_sketches)
+            self.distinct_sketches = dict(other.distinct_sketches)
+            return self
+
+        self.n_rows += other.n_rows
+        self.null_counts = self.null_counts + other.null_counts
+
+        if self.count is not None:
+            self.count, self.mean, self.m2, _ = _chan_merge(
+                self.count, self.mean, self.m2, other.count, other.mean, other.m2
+            )
+            self.minimum = np.fmin(self.minimum, other.minimum)
+            self.maximum = np.fmax(self.maximum, other.maximum)
+
+        if self.comoment is not None and other.comoment is not None:
+            count_a, count_b = self.pair_count, other.pair_count
+            self.pair_count, self.pair_mean, self.pair_m2, delta = _chan_merge(
+                count_a, self.pair_mean, self.pair_m2, count_b, other.pair_mean, other.pair_m2
+            )
+            with np.errstate(invalid='ignore', divide='ignore'):
+                weight = np.where(self.pair_count > 0, count_a * count_b / np.maximum(self.pair_count, 1), 0.0)
+            self.comoment = self.comoment + other.comoment + delta * delta.T * weight
+
+        for col, counts in other.frequencies.items():
+            if col not in self.frequencies:
+                self.frequencies[col] = counts
+            elif self.approximate:
+                self.frequencies[col].merge(counts)
+            else:
+                self.frequencies[col] = self.frequencies[col].add(counts, fill_value=0)
+        for sketches, other_sketches in ((self.quantile_sketches, other.quantile_sketches),
+                                         (self.distinct_sketches, other.distinct_sketches)):
+            for col, sketch in other_sketches.items():
+                if col in sketches:
+                    sketches[col].merge(sketch)
+                else:
+                    sketches[col] = sketch
+        return self
+
+    def missing_values(self):
+        return self.null_counts
+
+    def value_counts(self, columns=None):
+        """
+        Frequency tables of the categorical columns, most frequent first. In approximate
+        mode only the `top_k` most frequent categories are returned, with estimated counts.
+        """
+        columns = self.categorical_cols if columns is None else columns
+        if self.approximate:
+            return {col: self.frequencies[col].top(self.top_k) for col in columns}
+        return {
+            col: self.frequencies[col].astype('int64').sort_values(ascending=False, kind='stable')
+            for col in columns
+        }
+
+    def correlation(self):
+        """
+        Pearson correlation matrix over pairwise-complete observations.
+        """
+        if self.comoment is None:
+            return pd.DataFrame(index=self.numeric_cols, columns=self.numeric_cols, dtype='float64')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = self.comoment / np.sqrt(self.pair_m2 * self.pair_m2.T)
+        correlation = np.clip(correlation, -1.0, 1.0)
+        correlation[self.pair_count < 2] = np.nan
+        return pd.DataFrame(correlation, index=self.numeric_cols, columns=self.numeric_cols)
+
+    def describe(self, quantiles=None):
+        """
+        Build the same layout as DataFrame.describe(include='all').to_dict().
+
+        Args:
+            quantiles (pd.DataFrame, optional): Rows '25%', '50%', '75%' per numeric or datetime
+                column. Quantiles are not mergeable, so the caller supplies them.
+        """
+        moment_index = {col: i for i, col in enumerate(self.numeric_cols + self.datetime_cols)}
+        column_stats = {}
+        for col in self.columns:
+            if col in self.numeric_cols:
+                i = moment_index[col]
+                n = self.count[i]
+                stats = {
+                    'count': n,
+                    'mean': self.mean[i] if n > 0 else np.nan,
+                    'std': np.sqrt(self.m2[i] / (n - 1)) if n > 1 else np.nan,
+                    'min': self.minimum[i] if n > 0 else np.nan,
+                    'max': self.maximum[i] if n > 0 else np.nan,
+                }
+                for q in ['25%', '50%', '75%']:
+                    stats[q] = _quantile(quantiles, q, col)
+                column_stats[col] = {row: stats[row] for row in NUMERIC_ROWS}
+            elif col in self.datetime_cols:
+                i = moment_index[col]
+                n = self.count[i]
+                stats = {
+                    'count': int(n),
+                    'mean': pd.Timestamp(int(round(self.mean[i]))).round('us') if n > 0 else pd.NaT,
+                    'min': pd.Timestamp(int(self.minimum[i])) if n > 0 else pd.NaT,
+                    'max': pd.Timestamp(int(self.maximum[i])) if n > 0 else pd.NaT,
+                }
+                for q in ['25%', '50%', '75%']:
+                    stats[q] = _quantile(quantiles, q, col)
+                column_stats[col] = {row: stats[row] for row in DATETIME_ROWS}
+            elif self.approximate:
+                non_null = int(self.n_rows - self.null_counts[col])
+                counts = self.frequencies[col].top(1)
+                stats = {'count': non_null, 'unique': self.distinct_sketches[col].count()}
+            else:
+                counts = self.frequencies[col]
+                counts = counts[counts > 0]
+                non_null = int(self.n_rows - self.null_counts[col])
+                stats = {'count': non_null, 'unique': len(counts)}
+            if col not in moment_index:
+                if len(counts) > 0:
+                    stats['top'] = counts.idxmax()
+                    stats['freq'] = int(counts.max())
+                else:
+                    stats['top'] = np.nan
+                    stats['freq'] = np.nan
+                column_stats[col] = {row: stats[row] for row in CATEGORICAL_ROWS}
+
+        # Same row order as pandas: shortest row lists first, then first appearance
+        rows = []
+        for row_list in sorted((list(stats) for stats in column_stats.values()), key=len):
+            rows.extend(row for row in row_list if row not in rows)
+        return {
+            col: {row: stats.get(row, np.nan) for row in rows}
+            for col, stats in column_stats.items()
+        }
+
+
+    def quantiles(self):
+        """
+        Approximate 25/50/75% quantiles from the KLL sketches, in the layout of exact_quantiles.
+        """
+        if not self.quantile_sketches:
+            return None
+        quantiles = {}
+        for col, sketch in self.quantile_sketches.items():
+            values = sketch.quantiles(QUANTILES)
+            if col in self.datetime_cols:
+                values = [pd.NaT if np.isnan(value) else pd.Timestamp(int(value)) for value in values]
+            quantiles[col] = values
+        return pd.DataFrame(quantiles, index=['25%', '50%', '75%'])
+
+
+def _frequencies(series):
+    """
+    value_counts without the zero counts that unused categories of a categorical column get.
+    """
+    counts = series.value_counts()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        counts = counts[counts > 0]
+        counts.index = counts.index.astype(series.cat.categories.dtype)
+    return counts
+
+
+def _chan_merge(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+    """
+    Chan et al. parallel update of (count, mean, M2). Works element-wise on arrays.
+    """
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(count > 0, count_b / np.maximum(count, 1), 0.0)
+        mean = mean_a + delta * ratio
+        m2 = m2_a + m2_b + delta ** 2 * count_a * ratio
+    return count, mean, m2, delta
+
+
+def _quantile(quantiles, row, col):
+    if quantiles is None or col not in quantiles.columns:
+        return np.nan
+    value = quantiles.at[row, col]
+    return np.nan if pd.isnull(value) else value
+
+
+def exact_quantiles(df, columns):
+    """
+    Exact 25/50/75% quantiles of `columns`, indexed like describe() rows.
+    """
+    if not columns:
+        return None
+    # In batches of columns, so that a cancelled analysis stops between them
+    batches = []
+    for start in range(0, len(columns), QUANTILE_BATCH_COLUMNS):
+        check_cancelled()
+        batches.append(df[columns[start:start + QUANTILE_BATCH_COLUMNS]].quantile(QUANTILES))
+    quantiles = pd.concat(batches, axis=1)
+    quantiles.index = ['25%', '50%', '75%']
+    return quantiles
@@ -0,0 +1,188 @@
+import pandas as pd
+import numpy as np
+import logging
+from serialization import frame_to_dict
+from cancellation import check_cancelled
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AGGREGATES = ('sum', 'mean', 'count', 'min', 'max')
+# Running statistics each aggregate is derived from
+_AGGREGATE_STATS = {
+    'sum': ('sum',),
+    'mean': ('sum', 'count'),
+    'count': ('count',),
+    'min': ('min',),
+    'max': ('max',),
+}
+
+
+class TimeSeriesEngine:
+    """
+    Time series aggregation by calendar period without sorting the data.
+
+    Rows are grouped on the period of their date (`to_period`), which is a hash aggregation,
+    and the per-period sum, count, min and max of every numeric column are kept in a
+    TimeSeriesRollup. Rollups of different chunks or appended rows merge by adding counts and
+    sums and taking the min of minima and max of maxima, so new rows update their buckets
+    without touching history.
+
+    `date_columns` lists the date columns to aggregate by; None uses the first datetime column
+    and ['*'] every datetime column. `frequencies` are pandas period aliases ('h', 'D', 'W',
+    'M', 'Q', 'Y') and `aggregates` any of sum, mean, count, min and max.
+    """
+    def __init__(self, date_columns=None, frequencies=('M',), aggregates=('mean',)):
+        unknown = [aggregate for aggregate in aggregates if aggregate not in AGGREGATES]
+        if unknown:
+            raise ValueError(f"Unknown time series aggregates: {', '.join(unknown)}")
+        for freq in frequencies:
+            pd.PeriodDtype(freq)  # Raises on aliases that are not period frequencies
+        self.date_columns = list(date_columns) if date_columns else None
+        self.frequencies = list(frequencies)
+        self.aggregates = list(aggregates)
+
+    def settings(self):
+        """
+        The parameters that determine the results, for cache keys.
+        """
+        return {
+            "date_columns": self.date_columns,
+            "frequencies": self.frequencies,
+            "aggregates": self.aggregates,
+        }
+
+    def rollup(self, df=None):
+        """
+        An empty TimeSeriesRollup for this configuration, updated with `df` when given.
+        """
+        stats = sorted({stat for aggregate in self.aggregates for stat in _AGGREGATE_STATS[aggregate]})
+        rollup = TimeSeriesRollup(self.date_columns, self.frequencies, stats)
+        if df is not None:
+            rollup.update(df)
+        return rollup
+
+    def analyze(self, df):
+        return self.summarize(self.rollup(df))
+
+    def summarize(self, rollup):
+        """
+        The time series analysis result, {series: {period label: value}}.
+
+        With one date column, frequency and aggregate the series are the numeric columns, as
+        from df.resample(freq).mean(). Otherwise each series name is the column followed by the
+        settings that vary, e.g. "sales (sum, D) by order_date".
+        """
+        if not rollup.date_cols:
+            logger.warning("No date columns found for time series analysis.")
+            return {}
+        if not rollup.value_cols:
+            logger.warning("No numeric columns for time series analysis.")
+            return {}
+        results = {}
+        for date_col in rollup.date_cols:
+            for freq in self.frequencies:
+                buckets = rollup.buckets.get((date_col, freq))
+                if buckets is None or next(iter(buckets.values())).empty:
+                    continue
+                for aggregate in self.aggregates:
+                    series = frame_to_dict(self._aggregate(buckets, aggregate, freq))
+                    for col, values in series.items():
+                        results[self._series_name(col, date_col, freq, aggregate, rollup)] = values
+        logger.info("Time series analysis completed.")
+        return results
+
+    @staticmethod
+    def _aggregate(buckets, aggregate, freq):
+        if aggregate == 'mean':
+            frame = buckets['sum'] / buckets['count'].replace(0, np.nan)
+        else:
+            frame = buckets[aggregate]
+        # Every period in range is reported, like resample(): empty ones are 0 for sum and count, else missing
+        periods = pd.period_range(frame.index.min(), frame.index.max(), freq=freq)
+        frame = frame.reindex(periods, fill_value=0 if aggregate in ('sum', 'count') else np.nan)
+        # Label periods as resample() does: fixed-length ones by their start, calendar ones by their end date
+        if isinstance(pd.PeriodDtype(freq).freq, pd.offsets.Tick):
+            frame.index = periods.to_timestamp(how='start')
+        else:
+            frame.index = periods.to_timestamp(how='end').normalize()
+        return frame
+
+    def _series_name(self, col, date_col, freq, aggregate, rollup):
+        settings = []
+        if len(self.aggregates) > 1:
+            settings.append(aggregate)
+        if len(self.frequencies) > 1:
+            settings.append(freq)
+        name = f"{col} ({', '.join(settings)})" if settings else str(col)
+        if len(rollup.date_cols) > 1:
+            name = f"{name} by {date_col}"
+        return name
+
+
+class TimeSeriesRollup:
+    """
+    Per-period running statistics of the numeric columns, for every date column and frequency.
+    `buckets[(date_col, freq)][stat]` is a DataFrame indexed by period with one column per
+    numeric column. Built by TimeSeriesEngine.rollup.
+    """
+    def __init__(self, date_columns, frequencies, stats):
+        self.date_columns = date_columns
+        self.frequencies = frequencies
+        self.stats = stats
+        self.date_cols = None
+        self.value_cols = []
+        self.buckets = {}
+
+    def _bind(self, df):
+        datetime_cols = df.select_dtypes(include=['datetime', 'datetime64']).columns.tolist()
+        if self.date_columns is None:
+            self.date_cols = datetime_cols[:1]
+        elif self.date_columns == ['*']:
+            self.date_cols = datetime_cols
+        else:
+            self.date_cols = [col for col in self.date_columns if col in datetime_cols]
+        self.value_cols = df.select_dtypes(include='number').columns.tolist()
+
+    def update(self, df):
+        """
+        Fold the rows of `df` into their period buckets.
+        """
+        if self.date_cols is None:
+            self._bind(df)
+        if not self.value_cols:
+            return self
+        values = df[self.value_cols]
+        for date_col in self.date_cols:
+            for freq in self.frequencies:
+                check_cancelled()
+                # Rows without a date (NaT) fall out of the grouping
+                grouped = values.groupby(df[date_col].dt.to_period(freq), sort=False)
+                partial = {stat: getattr(grouped, stat)() for stat in self.stats}
+                self._merge_buckets((date_col, freq), partial)
+        return self
+
+    def merge(self, other):
+        """
+        Fold another rollup of the same configuration and columns into this one.
+        """
+        if other.date_cols is None:
+            return self
+        if self.date_cols is None:
+            self.date_cols, self.value_cols = other.date_cols, other.value_cols
+        for key, partial in other.buckets.items():
+            self._merge_buckets(key, partial)
+        return self
+
+    def _merge_buckets(self, key, partial):
+        current = self.buckets.get(key)
+        if current is None:
+            self.buckets[key] = partial
+            return
+        merged = {}
+        for stat, frame in partial.items():
+            combined = pd.concat([current[stat], frame]).groupby(level=0, sort=False)
+            # Counts and sums add up; minima and maxima take the min and max
+            merged[stat] = combined.sum() if stat in ('sum', 'count') else getattr(combined, stat)()
+        self.buckets[key] = merged